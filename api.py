@@ -0,0 +1,173 @@
+import datetime
+import hashlib
+import json
+
+from flask import Blueprint, Response, abort, current_app, jsonify, request, stream_with_context
+
+from models import db
+from models.artist import Artist
+from models.bulk import batched
+from models.genre import ArtistGenre, VenueGenre, genre_registry
+from models.replicas import use_replica
+from models.show import Show
+from models.venue import Venue
+from models.version import Version
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+# same keys as Venue.serialize and Artist.serialize, genres are added per chunk
+VENUE_COLUMNS = [
+    Venue.id, Venue.name, Venue.city, Venue.state, Venue.address, Venue.phone,
+    Venue.website, Venue.facebook_link, Venue.seeking_talent,
+    Venue.seeking_description, Venue.image_link,
+]
+ARTIST_COLUMNS = [
+    Artist.id, Artist.name, Artist.city, Artist.state, Artist.phone,
+    Artist.website, Artist.facebook_link, Artist.seeking_venue,
+    Artist.seeking_description, Artist.image_link,
+]
+
+
+@api.before_request
+def _read_only():
+    # every endpoint of the API only reads
+    use_replica()
+
+
+def _json_default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def _dumps(data):
+    return json.dumps(data, default=_json_default, separators=(',', ':'))
+
+
+def _chunk_size():
+    return current_app.config.get('API_STREAM_CHUNK_SIZE', 1000)
+
+
+def _etag(*parts):
+    return hashlib.sha1(_dumps(parts).encode()).hexdigest()
+
+
+def _not_modified(etag):
+    response = Response(status=304)
+    response.set_etag(etag, weak=True)
+    return response
+
+
+def _conditional(names, key, build):
+    # the etag comes from the change counters of every table the payload
+    # reads, so an unchanged result costs one primary key lookup, a key
+    # covers anything else the payload depends on
+    etag = _etag(request.path, key, Version.get_many(*names))
+    if request.if_none_match.contains_weak(etag):
+        return _not_modified(etag)
+    response = build()
+    response.set_etag(etag, weak=True)
+    return response
+
+
+def _details_key(changes):
+    # shows are split into past and upcoming against now, the upcoming
+    # count moves when a show starts, see Show.get_changes
+    return None if changes is None else list(changes)
+
+
+def _genre_names(link_model, owner_column, ids):
+    # link rows only, names come from the registry
+    names = {id: [] for id in ids}
+    rows = db.session.query(owner_column, link_model.genre_id).filter(owner_column.in_(ids))
+    for owner_id, genre_id in rows:
+        names[owner_id].append(genre_registry.name(genre_id))
+    for genres in names.values():
+        genres.sort()
+    return names
+
+
+def _with_genres(query, link_model, owner_column):
+    # server side cursor over the rows, one genre query per chunk
+    chunk_size = _chunk_size()
+    for chunk in batched(query.yield_per(chunk_size), chunk_size):
+        genres = _genre_names(link_model, owner_column, [row.id for row in chunk])
+        for row in chunk:
+            item = row._asdict()
+            item['genres'] = genres[row.id]
+            yield item
+
+
+def _ndjson(items):
+    def generate():
+        for item in items:
+            yield _dumps(item) + '\n'
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+
+def _json(data):
+    return Response(_dumps(data), mimetype='application/json')
+
+
+@api.route('/genres')
+def genres():
+    return _conditional(
+        ['genres'], None,
+        lambda: _json([{'id': id, 'name': name} for id, name in genre_registry.choices()])
+    )
+
+
+@api.route('/venues')
+def venues():
+    return _conditional(['venues', 'genres'], None, lambda: _ndjson(_with_genres(
+        db.session.query(*VENUE_COLUMNS).order_by(Venue.id), VenueGenre, VenueGenre.venue_id
+    )))
+
+
+@api.route('/venues/<int:venue_id>')
+def venue(venue_id):
+    return _conditional(
+        ['venues', 'artists', 'shows', 'genres'], _details_key(Show.get_venue_changes(venue_id)),
+        lambda: _json(Venue.get_by_id_full(venue_id))
+    )
+
+
+@api.route('/artists')
+def artists():
+    return _conditional(['artists', 'genres'], None, lambda: _ndjson(_with_genres(
+        db.session.query(*ARTIST_COLUMNS).order_by(Artist.id), ArtistGenre, ArtistGenre.artist_id
+    )))
+
+
+@api.route('/artists/<int:artist_id>')
+def artist(artist_id):
+    return _conditional(
+        ['venues', 'artists', 'shows', 'genres'], _details_key(Show.get_artist_changes(artist_id)),
+        lambda: _json(Artist.get_by_id_full(artist_id))
+    )
+
+
+@api.route('/shows')
+def shows():
+    def items():
+        query = Show.details_query().order_by(Show.start_time, Show.id)
+        for row in query.yield_per(_chunk_size()):
+            yield Show.row_details(row)
+
+    return _conditional(['venues', 'artists', 'shows'], None, lambda: _ndjson(items()))
+
+
+@api.route('/shows/<int:show_id>')
+def show(show_id):
+    def build():
+        row = Show.details_query().filter(Show.id == show_id).first()
+        if row is None:
+            abort(404)
+        return _json(Show.row_details(row))
+
+    return _conditional(['venues', 'artists', 'shows'], show_id, build)
+
+
+@api.errorhandler(404)
+def not_found(error):
+    return jsonify({'error': 'not found'}), 404
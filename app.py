@@ -5,18 +5,27 @@ import logging
 import sys
 from logging import Formatter, FileHandler
 
-import babel
-import dateutil.parser
-from flask import Flask, render_template, request, flash, redirect, url_for, abort
+from flask import Flask, render_template, request, flash, redirect, url_for, jsonify, g
 from flask_migrate import Migrate
 from flask_moment import Moment
 
+from api import api
+from cache import MISSING, Cache
+from config import get_config
 from forms import *
-from models import db
+from formatting import format_datetime
+from fragments import FragmentCacheExtension, cache_version
+from http_cache import change_validators, conditional, init_http_cache, table_validators
+from models import db, init_query_stats
 from models.artist import Artist
-from models.genre import Genre, VenueGenre, ArtistGenre
+from models.counters import ShowRollover
+from models.directory import VenueDirectory
+from models.genre import genre_registry
+from models.pagination import page_size
+from models.replicas import init_replicas, read_only
 from models.show import Show
 from models.venue import Venue
+from models.version import Version
 
 # ----------------------------------------------------------------------------#
 # App Config.
@@ -24,25 +33,59 @@ from models.venue import Venue
 
 app = Flask(__name__)
 moment = Moment(app)
-app.config.from_object('config')
+app.config.from_object(get_config())
 db.init_app(app)
+init_query_stats(app)
+init_http_cache(app)
+init_replicas(app)
 migrate = Migrate(app, db)
+cache = Cache(app)
+app.register_blueprint(api)
 
 
 # ----------------------------------------------------------------------------#
 # Filters.
 # ----------------------------------------------------------------------------#
 
-def format_datetime(value, format='medium'):
-    date = dateutil.parser.parse(value)
-    if format == 'full':
-        format = "EEEE MMMM, d, y 'at' h:mma"
-    elif format == 'medium':
-        format = "EE MM, dd, y h:mma"
-    return babel.dates.format_datetime(date, format)
+app.jinja_env.filters['datetime'] = format_datetime
+app.jinja_env.add_extension(FragmentCacheExtension)
+app.jinja_env.globals['cache_version'] = cache_version
 
 
-app.jinja_env.filters['datetime'] = format_datetime
+# ----------------------------------------------------------------------------#
+# Helpers.
+# ----------------------------------------------------------------------------#
+
+def venue_cache_key(venue_id):
+    return f'venue:{venue_id}'
+
+
+def artist_cache_key(artist_id):
+    return f'artist:{artist_id}'
+
+
+def cached_details(key, factory):
+    # stored with the page's etag, see http_cache.conditional, so an entry
+    # built before a write, or from a lagging replica, is never served for
+    # newer data, writes still delete the key
+    etag = g.get('etag')
+    if etag is None:
+        return factory()
+    cached = cache.get(key)
+    if cached is not MISSING and cached[0] == etag:
+        return cached[1]
+    data = factory()
+    cache.set(key, (etag, data))
+    return data
+
+
+def page_args():
+    # keyset pagination arguments shared by the listing pages
+    return {
+        'after': request.args.get('after'),
+        'before': request.args.get('before'),
+        'limit': request.args.get('limit', type=int)
+    }
 
 
 # ----------------------------------------------------------------------------#
@@ -58,15 +101,21 @@ def index():
 #  ----------------------------------------------------------------
 
 @app.route('/venues')
+@read_only
+@conditional(table_validators(Venue))
 def venues():
     # TODO: replace with real venues data.
     #       num_shows should be aggregated based on number of upcoming shows per venue.
 
-    data = Venue.get_all()
-    return render_template('pages/venues.html', areas=data);
+    args = page_args()
+    page = Venue.get_all(**args)
+    # keys the cached area blocks, other query parameters do not change them
+    page_key = ':'.join([args['after'] or '', args['before'] or '', str(page_size(args['limit']))])
+    return render_template('pages/venues.html', areas=page.items, page=page, page_key=page_key)
 
 
 @app.route('/venues/search', methods=['POST'])
+@read_only
 def search_venues():
     # TODO: implement search on artists with partial string search. Ensure it is case-insensitive.
     # seach for Hop should return "The Musical Hop".
@@ -82,10 +131,19 @@ def search_venues():
                            search_term=request.form.get('search_term', ''))
 
 
+@app.route('/venues/autocomplete')
+@read_only
+def autocomplete_venues():
+    venues = Venue.autocomplete(request.args.get('q'), limit=request.args.get('limit', type=int))
+    return jsonify({'data': venues})
+
+
 @app.route('/venues/<int:venue_id>')
+@read_only
+@conditional(lambda venue_id: change_validators(Show.get_venue_changes(venue_id), 'genres'))
 def show_venue(venue_id):
     # shows the venue page with the given venue_id
-    data = Venue.get_by_id_full(venue_id)
+    data = cached_details(venue_cache_key(venue_id), lambda: Venue.get_by_id_full(venue_id))
     return render_template('pages/show_venue.html', venue=data)
 
 
@@ -95,7 +153,7 @@ def show_venue(venue_id):
 @app.route('/venues/create', methods=['GET'])
 def create_venue_form():
     form = VenueForm()
-    form.genres.choices = Genre.get_enum()
+    form.genres.choices = genre_registry.choices()
 
     return render_template('forms/new_venue.html', form=form)
 
@@ -108,6 +166,7 @@ def create_venue_submission():
             name=data.get('name'),
             city=data.get('city'),
             state=data.get('state'),
+            address=data.get('address'),
             phone=data.get('phone'),
             image_link=data.get('image_link'),
             facebook_link=data.get('facebook_link'),
@@ -121,13 +180,12 @@ def create_venue_submission():
             flash('Venue with specified name already exists')
         else:
 
+            # flush for the new id, the venue and its genres commit together
             db.session.add(new_venue)
-            db.session.commit()
-
-            # extract genres from form
-            genres = data.get('genres')
-
-            db.session.add_all(new_venue.add_genres(genres))
+            db.session.flush()
+            new_venue.sync_genres(data.get('genres'), current=())
+            Version.bump('venues')
+            VenueDirectory.refresh_after_write(new_venue.id)
             db.session.commit()
 
             # on successful db insert, flash success
@@ -136,6 +194,7 @@ def create_venue_submission():
     except:
 
         # TODO: on unsuccessful db insert, flash an error instead.
+        db.session.rollback()
         print(sys.exc_info())
         flash('An error occurred. Venue ' + data.get('name') + ' could not be listed.')
     finally:
@@ -162,7 +221,10 @@ def delete_venue(venue_id):
             db.session.delete(venue)
             print('permannet deletion')
             flash('Venue with id ' + venue_id + ' was successfully permanently deleted!')
+        Version.bump('venues')
+        VenueDirectory.refresh_after_write(venue.id)
         db.session.commit()
+        cache.delete(venue_cache_key(venue_id))
     except:
         # SQLAlchemy ORM to delete a record. Handle cases where the session commit could fail.
         flash('Error deleting Venue with id ' + venue_id + '!')
@@ -178,16 +240,17 @@ def delete_venue(venue_id):
 #  Artists
 #  ----------------------------------------------------------------
 @app.route('/artists')
+@read_only
+@conditional(table_validators(Artist))
 def artists():
     # TODO: replace with real data returned from querying the database
 
-    artists = Artist.query.with_entities(Artist.id, Artist.name).all()
-
-    data = [{'id': artist.id, 'name': artist.name} for artist in artists]
-    return render_template('pages/artists.html', artists=data)
+    page = Artist.get_all(**page_args())
+    return render_template('pages/artists.html', artists=page.items, page=page)
 
 
 @app.route('/artists/search', methods=['POST'])
+@read_only
 def search_artists():
     search_term = request.form.get('search_term')
     artists = Artist.get_artists_by_name(search_term)
@@ -200,11 +263,20 @@ def search_artists():
                            search_term=request.form.get('search_term', ''))
 
 
+@app.route('/artists/autocomplete')
+@read_only
+def autocomplete_artists():
+    artists = Artist.autocomplete(request.args.get('q'), limit=request.args.get('limit', type=int))
+    return jsonify({'data': artists})
+
+
 @app.route('/artists/<int:artist_id>')
+@read_only
+@conditional(lambda artist_id: change_validators(Show.get_artist_changes(artist_id), 'genres'))
 def show_artist(artist_id):
     # shows the venue page with the given venue_id
     # TODO: replace with real venue data from the venues table, using venue_id
-    data = Artist.get_by_id_full(artist_id)
+    data = cached_details(artist_cache_key(artist_id), lambda: Artist.get_by_id_full(artist_id))
     return render_template('pages/show_artist.html', artist=data)
 
 
@@ -212,13 +284,14 @@ def show_artist(artist_id):
 #  ----------------------------------------------------------------
 @app.route('/artists/<int:artist_id>/edit', methods=['GET'])
 def edit_artist(artist_id):
-    artist = Artist.get_by_id(artist_id).serialize
+    artist_obj = Artist.get_by_id(artist_id)
+    artist = artist_obj.serialize
 
-    # set current genres
-    artist['genres'] = ArtistGenre.get_genres_ids(artist_id)
+    # set current genres, from the links serialize loaded
+    artist['genres'] = artist_obj.get_genre_ids()
 
     form = ArtistForm(**artist)
-    form.genres.choices = Genre.get_enum()
+    form.genres.choices = genre_registry.choices()
 
     return render_template('forms/edit_artist.html', form=form, artist=artist)
 
@@ -227,7 +300,7 @@ def edit_artist(artist_id):
 def edit_artist_submission(artist_id):
     # TODO: take values from the form submitted, and update existing
     # artist record with ID <artist_id> using the new attributes
-    data = VenueForm(request.form).data
+    data = ArtistForm(request.form).data
 
     try:
         artist = Artist.query.get(artist_id)
@@ -240,14 +313,15 @@ def edit_artist_submission(artist_id):
         artist.website = data.get('website')
         artist.seeking_venue=data.get('seeking_venue')
         artist.seeking_description=data.get('seeking_description')
-        updated_genres = data.get('genres')
-
-        # Delete genres that are not in updated_genres
-        ArtistGenre.delete_old(artist_id=artist_id, genres=updated_genres)
-
-        # update venue genres
-        artist.update_genres(updated_genres)
+        artist.sync_genres(data.get('genres'))
+        Version.bump('artists')
         db.session.commit()
+
+        # the artist page and the pages of venues listing its shows
+        cache.delete(
+            artist_cache_key(artist_id),
+            *[venue_cache_key(id) for id in Show.get_venue_ids_by_artist(artist_id)]
+        )
     except:
         print(sys.exc_info())
         db.session.rollback()
@@ -260,15 +334,16 @@ def edit_artist_submission(artist_id):
 
 @app.route('/venues/<int:venue_id>/edit', methods=['GET'])
 def edit_venue(venue_id):
-    venue = Venue.get_by_id(venue_id)
+    venue_obj = Venue.query.get_or_404(venue_id)
+    venue = venue_obj.serialize
     print(dir(venue))
 
-    # set current genres
-    venue['genres'] = VenueGenre.get_genres_ids(venue_id)
+    # set current genres, from the links serialize loaded
+    venue['genres'] = venue_obj.get_genre_ids()
 
     form = VenueForm(**venue)
     #  set genres list
-    form.genres.choices = Genre.get_enum()
+    form.genres.choices = genre_registry.choices()
 
     return render_template('forms/edit_venue.html', form=form, venue=venue)
 
@@ -288,14 +363,17 @@ def edit_venue_submission(venue_id):
         vn.website = data.get('website')
         vn.seeking_talent=data.get('seeking_talent')
         vn.seeking_description=data.get('seeking_description')
-        updated_genres = data.get('genres')
-
-        # Delete genres that are not in updated_genres
-        VenueGenre.delete_old(venue_id=venue_id, genres=updated_genres)
-
-        # update venue genres
-        vn.update_genres(updated_genres)
+        vn.address = data.get('address')
+        vn.sync_genres(data.get('genres'))
+        Version.bump('venues')
+        VenueDirectory.refresh_after_write(vn.id)
         db.session.commit()
+
+        # the venue page and the pages of artists listing its shows
+        cache.delete(
+            venue_cache_key(venue_id),
+            *[artist_cache_key(id) for id in Show.get_artist_ids_by_venue(venue_id)]
+        )
     except:
         print(sys.exc_info())
         db.session.rollback()
@@ -312,7 +390,7 @@ def edit_venue_submission(venue_id):
 @app.route('/artists/create', methods=['GET'])
 def create_artist_form():
     form = ArtistForm()
-    form.genres.choices = Genre.get_enum()
+    form.genres.choices = genre_registry.choices()
     return render_template('forms/new_artist.html', form=form)
 
 
@@ -326,8 +404,8 @@ def create_artist_submission():
         new_artist = Artist(
             name=data.get('name'),
             city=data.get('city'),
-            state=data.get('phone'),
-            phone=data.get('name'),
+            state=data.get('state'),
+            phone=data.get('phone'),
             image_link=data.get('image_link'),
             facebook_link=data.get('facebook_link'),
             seeking_venue=data.get('seeking_venue'),
@@ -338,13 +416,11 @@ def create_artist_submission():
             flash('Artist with specified name already exists')
         else:
 
+            # flush for the new id, the artist and its genres commit together
             db.session.add(new_artist)
-            db.session.commit()
-
-            # extract genres from form
-            genres = data.get('genres')
-
-            db.session.add_all(new_artist.add_genres(genres))
+            db.session.flush()
+            new_artist.sync_genres(data.get('genres'), current=())
+            Version.bump('artists')
             db.session.commit()
 
             # on successful db insert, flash success
@@ -353,6 +429,7 @@ def create_artist_submission():
     except:
 
         # TODO: on unsuccessful db insert, flash an error instead.
+        db.session.rollback()
         print(sys.exc_info())
         flash('An error occurred. Artist ' + request.form.get('name') + ' could not be listed.')
     finally:
@@ -365,20 +442,21 @@ def create_artist_submission():
 #  ----------------------------------------------------------------
 
 @app.route('/shows')
+@read_only
+@conditional(table_validators(Show, Artist, Venue))
 def shows():
     # displays list of shows at /shows
     # TODO: replace with real venues data.
     #       num_shows should be aggregated based on number of upcoming shows per venue.
-    data = Show.get_all()
-    return render_template('pages/shows.html', shows=data)
+    page = Show.get_all(**page_args())
+    return render_template('pages/shows.html', shows=page.items, page=page)
 
 
 @app.route('/shows/create')
 def create_shows():
     # renders form. do not touch.
+    # artists and venues are looked up by the autocomplete endpoints
     form = ShowForm()
-    form.artist_id.choices = Artist.get_enum()
-    form.venue_id.choices = Venue.get_enum()
 
     return render_template('forms/new_show.html', form=form)
 
@@ -386,8 +464,15 @@ def create_shows():
 @app.route('/shows/create', methods=['POST'])
 def create_show_submission():
     # called to create new shows in the db, upon submitting new show listing form
+    # the forms render no csrf token
+    form = ShowForm(request.form, meta={'csrf': False})
+    if not form.validate():
+        for field, errors in form.errors.items():
+            flash(f'{field}: {", ".join(errors)}')
+        return render_template('forms/new_show.html', form=form)
+
     try:
-        data = ShowForm(request.form).data
+        data = form.data
         new_show = Show(
             artist_id=data.get('artist_id'),
             venue_id=data.get('venue_id'),
@@ -395,7 +480,11 @@ def create_show_submission():
         )
 
         db.session.add(new_show)
+        ShowRollover.count_new(new_show.venue_id, new_show.artist_id, new_show.start_time)
+        Version.bump('shows', 'venues', 'artists')
+        VenueDirectory.refresh_after_write(new_show.venue_id)
         db.session.commit()
+        cache.delete(venue_cache_key(data.get('venue_id')), artist_cache_key(data.get('artist_id')))
 
         # on successful db insert, flash success
         flash('Show created successfully !')
@@ -0,0 +1,325 @@
+# ----------------------------------------------------------------------------#
+# Imports
+# ----------------------------------------------------------------------------#
+import datetime
+import http.client
+import json
+import statistics
+import sys
+import threading
+import time
+import timeit
+from urllib.parse import urlsplit
+
+import babel.dates
+import dateutil.parser
+from flask_script import Manager
+from sqlalchemy import event
+
+from app import app, cache
+from cache import NullCache
+from formatting import FORMATS, clear_cache, format_datetime
+from models import db, get_query_stats
+from models.artist import Artist
+from models.show import Show
+from models.venue import Venue
+
+# ----------------------------------------------------------------------------#
+# App Config.
+# ----------------------------------------------------------------------------#
+
+manager = Manager(app)
+
+# metrics where a higher number than the baseline is a regression
+LATENCY_METRICS = ['p50_ms', 'p95_ms', 'p99_ms', 'db_ms']
+VOLUME_METRICS = ['queries', 'rows', 'objects']
+
+# requests per endpoint and run that a latency metric needs on both sides
+# to fail compare, a tail percentile needs at least 5 requests above it,
+# smaller samples are printed but too noisy to gate on
+MIN_GATED_REQUESTS = {'p50_ms': 30, 'db_ms': 30, 'p95_ms': 100, 'p99_ms': 500}
+
+
+# ----------------------------------------------------------------------------#
+# Counters.
+# ----------------------------------------------------------------------------#
+
+# queries, rows and db time come from the request's QueryStats,
+# ORM objects loaded are counted here
+loaded_objects = [0]
+
+
+def count_loaded_object(target, context):
+    loaded_objects[0] += 1
+
+
+def install_counters():
+    app.config['QUERY_STATS_ENABLED'] = True
+    if not event.contains(db.Model, 'load', count_loaded_object):
+        event.listen(db.Model, 'load', count_loaded_object, propagate=True)
+
+
+# ----------------------------------------------------------------------------#
+# Scenarios.
+# ----------------------------------------------------------------------------#
+
+def busiest(column):
+    return db.session.query(column).group_by(column).order_by(
+        db.func.count(Show.id).desc()
+    ).limit(1).scalar()
+
+
+def scenarios():
+    with app.app_context():
+        venue_id = busiest(Show.venue_id) or db.session.query(db.func.min(Venue.id)).scalar()
+        artist_id = busiest(Show.artist_id) or db.session.query(db.func.min(Artist.id)).scalar()
+        db.session.remove()
+
+    return [
+        ('venues', 'GET', '/venues', None),
+        ('shows', 'GET', '/shows', None),
+        ('artists', 'GET', '/artists', None),
+        ('search_venues', 'POST', '/venues/search', {'search_term': 'blue'}),
+        ('search_venues_short', 'POST', '/venues/search', {'search_term': 'ro'}),
+        ('search_artists', 'POST', '/artists/search', {'search_term': 'band'}),
+        ('show_venue', 'GET', f'/venues/{venue_id}', None),
+        ('show_artist', 'GET', f'/artists/{artist_id}', None),
+    ]
+
+
+def percentile(values, percent):
+    # nearest rank
+    ordered = sorted(values)
+    index = max(0, int(round(percent / 100.0 * len(ordered) + 0.5)) - 1)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+def measure(client, method, path, data, requests, warmup):
+    for _ in range(warmup):
+        client.open(path, method=method, data=data)
+
+    latencies, db_time, queries, rows, objects = [], [], [], [], []
+    for _ in range(requests):
+        loaded_objects[0] = 0
+        # keeps the request context, and its query stats, until the block ends
+        with client:
+            started = time.perf_counter()
+            response = client.open(path, method=method, data=data)
+            latencies.append((time.perf_counter() - started) * 1000)
+            stats = get_query_stats()
+        # commands run inside an app context that outlives each request,
+        # drop the session so the identity map does not carry over
+        db.session.remove()
+        if response.status_code >= 400:
+            raise RuntimeError(f'{method} {path} answered {response.status_code}')
+        db_time.append(stats.duration * 1000)
+        queries.append(stats.count)
+        rows.append(stats.rows)
+        objects.append(loaded_objects[0])
+
+    return {
+        'method': method,
+        'path': path,
+        'requests': requests,
+        'mean_ms': round(sum(latencies) / len(latencies), 3),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'db_ms': round(percentile(db_time, 50), 3),
+        'queries': max(queries),
+        'rows': max(rows),
+        'objects': max(objects),
+    }
+
+
+def combine(samples):
+    # the median of each latency metric over the runs, volumes are the largest
+    combined = dict(samples[0])
+    for metric in ['mean_ms'] + LATENCY_METRICS:
+        combined[metric] = round(statistics.median(sample[metric] for sample in samples), 3)
+    for metric in VOLUME_METRICS:
+        combined[metric] = max(sample[metric] for sample in samples)
+    return combined
+
+
+def run_suite(requests, warmup, with_cache, runs=1):
+    if not with_cache:
+        cache.backend = NullCache()
+    install_counters()
+
+    with app.app_context():
+        meta = {
+            'created': datetime.datetime.utcnow().isoformat(),
+            'dialect': db.engine.dialect.name,
+            'requests': requests,
+            'runs': runs,
+            'with_cache': with_cache,
+            'venues': Venue.query.count(),
+            'artists': Artist.query.count(),
+            'shows': Show.query.count(),
+        }
+        db.session.remove()
+
+    client = app.test_client()
+    # whole suite per run, so a slow moment of the machine hits one run only
+    paths = scenarios()
+    samples = {}
+    for _ in range(runs):
+        for name, method, path, data in paths:
+            samples.setdefault(name, []).append(measure(client, method, path, data, requests, warmup))
+    results = {}
+    for name, endpoint_samples in samples.items():
+        results[name] = combine(endpoint_samples)
+        print('{:<22} p50 {p50_ms:>9.2f}ms  p95 {p95_ms:>9.2f}ms  db {db_ms:>9.2f}ms  queries {queries:>4}  '
+              'rows {rows:>7}  objects {objects:>7}'.format(name, **results[name]))
+
+    return {'meta': meta, 'endpoints': results}
+
+
+def regressions(baseline, current, threshold, min_delta_ms):
+    failures = []
+    requests = min(baseline['meta']['requests'], current['meta']['requests'])
+    gated = [metric for metric in LATENCY_METRICS if requests >= MIN_GATED_REQUESTS[metric]]
+    for name, before in baseline['endpoints'].items():
+        after = current['endpoints'].get(name)
+        if after is None:
+            continue
+        for metric in gated:
+            # timer noise on very fast endpoints is not a regression
+            if after[metric] > before[metric] * (1 + threshold) and \
+                    after[metric] - before[metric] > min_delta_ms:
+                failures.append(f'{name} {metric} {before[metric]} -> {after[metric]}')
+        # query and row counts are deterministic for a given dataset
+        for metric in VOLUME_METRICS:
+            if after[metric] > before[metric]:
+                failures.append(f'{name} {metric} {before[metric]} -> {after[metric]}')
+    return failures
+
+
+def legacy_format_datetime(value, format):
+    # the filter before formatting.py, strftime string in, reparsed every call
+    return babel.dates.format_datetime(dateutil.parser.parse(value), FORMATS[format])
+
+
+def time_per_call(function, values, repeat, setup=None):
+    # best of repeat passes over the values, setup runs before each pass
+    best = min(timeit.repeat(
+        lambda: [function(value) for value in values], setup=setup or (lambda: None), number=1, repeat=repeat
+    ))
+    return best / len(values) * 1e6
+
+
+def hammer(url, paths, deadline, results):
+    # one keep-alive connection per client thread, like a browser or a proxy
+    parts = urlsplit(url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+    latencies, errors = [], 0
+    while time.perf_counter() < deadline:
+        path = paths[len(latencies) % len(paths)]
+        started = time.perf_counter()
+        try:
+            connection.request('GET', parts.path.rstrip('/') + path)
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 400:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            connection.close()
+        latencies.append((time.perf_counter() - started) * 1000)
+    connection.close()
+    results.append((latencies, errors))
+
+
+# ----------------------------------------------------------------------------#
+# Commands.
+# ----------------------------------------------------------------------------#
+
+@manager.option('-n', '--requests', dest='requests', type=int, default=50)
+@manager.option('-r', '--runs', dest='runs', type=int, default=3,
+                help='latencies are the median of this many runs')
+@manager.option('--warmup', dest='warmup', type=int, default=3)
+@manager.option('--with-cache', dest='with_cache', action='store_true', default=False)
+@manager.option('-o', '--output', dest='output', default='benchmark_baseline.json')
+def run(requests, runs, warmup, with_cache, output):
+    """Benchmark the request paths and write a JSON baseline"""
+    report = run_suite(requests, warmup, with_cache, runs)
+    with open(output, 'w') as baseline_file:
+        json.dump(report, baseline_file, indent=2, sort_keys=True)
+    print(f'baseline written to {output}')
+
+
+@manager.option('-b', '--baseline', dest='baseline', default='benchmark_baseline.json')
+@manager.option('-t', '--threshold', dest='threshold', type=float, default=0.2,
+                help='allowed relative latency increase, 0.2 is 20%')
+@manager.option('--min-delta-ms', dest='min_delta_ms', type=float, default=2.0,
+                help='latency increases smaller than this are ignored')
+@manager.option('-n', '--requests', dest='requests', type=int, default=None)
+@manager.option('-r', '--runs', dest='runs', type=int, default=3,
+                help='latencies are the median of this many runs')
+@manager.option('--warmup', dest='warmup', type=int, default=3)
+def compare(baseline, threshold, min_delta_ms, requests, runs, warmup):
+    """Benchmark the request paths and fail on regressions against a baseline"""
+    with open(baseline) as baseline_file:
+        before = json.load(baseline_file)
+
+    after = run_suite(requests or before['meta']['requests'], warmup, before['meta']['with_cache'], runs)
+    failures = regressions(before, after, threshold, min_delta_ms)
+    requests = min(before['meta']['requests'], after['meta']['requests'])
+    for metric, minimum in MIN_GATED_REQUESTS.items():
+        if requests < minimum:
+            print(f'{metric} not compared, needs -n {minimum} or more on both sides')
+    for failure in failures:
+        print(f'REGRESSION {failure}')
+    if failures:
+        sys.exit(1)
+    print('no regressions')
+
+
+@manager.option('-n', '--tiles', dest='tiles', type=int, default=1000)
+@manager.option('--distinct', dest='distinct', type=int, default=100,
+                help='distinct start times among the tiles')
+@manager.option('--repeat', dest='repeat', type=int, default=5)
+def formatting(tiles, distinct, repeat):
+    """Time the datetime filter on one page of show tiles"""
+    start = datetime.datetime(2026, 1, 1, 20, 0)
+    times = [start + datetime.timedelta(minutes=30 * (index % distinct)) for index in range(tiles)]
+    strings = [value.strftime('%m/%d/%Y, %H:%M') for value in times]
+
+    legacy = time_per_call(lambda value: legacy_format_datetime(value, 'full'), strings, repeat)
+    cold = time_per_call(lambda value: format_datetime(value, 'full'), times, repeat, clear_cache)
+    warm = time_per_call(lambda value: format_datetime(value, 'full'), times, repeat)
+    print(f'{tiles} tiles, {distinct} distinct start times')
+    print(f'dateutil + babel   {legacy:>9.2f}us per call')
+    print(f'compiled, cold     {cold:>9.2f}us per call')
+    print(f'compiled, warm     {warm:>9.2f}us per call')
+
+
+@manager.option('-u', '--url', dest='url', default='http://127.0.0.1:5000')
+@manager.option('-c', '--concurrency', dest='concurrency', type=int, default=8)
+@manager.option('-d', '--duration', dest='duration', type=float, default=10)
+@manager.option('-p', '--path', dest='paths', action='append', default=None,
+                help='repeat for several paths, defaults to the listing pages')
+def throughput(url, concurrency, duration, paths):
+    """Measure requests per second of a running server"""
+    paths = paths or ['/venues', '/artists', '/shows']
+    results = []
+    deadline = time.perf_counter() + duration
+    clients = [
+        threading.Thread(target=hammer, args=(url, paths, deadline, results))
+        for _ in range(concurrency)
+    ]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+
+    latencies = [latency for client_latencies, _ in results for latency in client_latencies]
+    errors = sum(client_errors for _, client_errors in results)
+    print(f'{url} {concurrency} clients {duration:.0f}s')
+    print(f'requests {len(latencies)}  errors {errors}  {len(latencies) / duration:.1f} req/s  '
+          f'p50 {percentile(latencies, 50):.2f}ms  p95 {percentile(latencies, 95):.2f}ms')
+
+
+if __name__ == '__main__':
+    manager.run()
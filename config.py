@@ -1,14 +1,130 @@
 import os
-SECRET_KEY = os.urandom(32)
+
 # Grabs the folder where the script runs.
 basedir = os.path.abspath(os.path.dirname(__file__))
 
-# Enable debug mode.
-DEBUG = True
 
-# Connect to the database
+def replica_binds(uris):
+    # SQLALCHEMY_REPLICA_URIS, comma separated, become the replica_1, replica_2... binds
+    uris = [uri.strip() for uri in (uris or '').split(',') if uri.strip()]
+    return {f'replica_{index}': uri for index, uri in enumerate(uris, 1)}
+
+
+def engine_options(uri, pool_size=5, max_overflow=10, pool_recycle=1800, pool_timeout=10,
+                   statement_timeout_ms=0):
+    # pool settings only apply to server databases, sqlite uses its own pools
+    if not uri or not uri.startswith('postgres'):
+        return {}
+    options = {
+        'pool_size': pool_size,
+        'max_overflow': max_overflow,
+        'pool_recycle': pool_recycle,
+        'pool_timeout': pool_timeout,
+        'pool_pre_ping': True,
+    }
+    if statement_timeout_ms:
+        options['connect_args'] = {'options': f'-c statement_timeout={statement_timeout_ms}'}
+    return options
+
+
+class Config(object):
+    SECRET_KEY = os.environ.get('SECRET_KEY') or os.urandom(32)
+    DEBUG = False
+
+    # Connect to the database
+    SQLALCHEMY_DATABASE_URI = os.environ.get('SQLALCHEMY_DATABASE_URI')
+    # SQLALCHEMY_TRACK_MODIFICATIONS = True
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+
+    # Read replicas of the primary, see models.replicas. Read only views use
+    # one that lags at most REPLICA_MAX_LAG_SECONDS, checked every
+    # REPLICA_LAG_CHECK_SECONDS, and a user who wrote reads the primary for
+    # READ_YOUR_WRITES_SECONDS, longer than the lag and the check together
+    SQLALCHEMY_BINDS = replica_binds(os.environ.get('SQLALCHEMY_REPLICA_URIS'))
+    REPLICA_MAX_LAG_SECONDS = float(os.environ.get('REPLICA_MAX_LAG_SECONDS', 5))
+    REPLICA_LAG_CHECK_SECONDS = float(os.environ.get('REPLICA_LAG_CHECK_SECONDS', 5))
+    READ_YOUR_WRITES_SECONDS = float(os.environ.get('READ_YOUR_WRITES_SECONDS', 15))
+
+    # Listing pages
+    PAGE_SIZE = int(os.environ.get('PAGE_SIZE', 50))
+    MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', 200))
+
+    # Genres are cached per process, the version stamp in the db is
+    # checked at most this often
+    GENRE_REGISTRY_CHECK_SECONDS = int(os.environ.get('GENRE_REGISTRY_CHECK_SECONDS', 30))
+
+    # Search
+    SEARCH_RESULT_LIMIT = int(os.environ.get('SEARCH_RESULT_LIMIT', 50))
+    AUTOCOMPLETE_LIMIT = int(os.environ.get('AUTOCOMPLETE_LIMIT', 10))
+
+    # Cache for venue and artist detail pages, 'memory', 'redis' or 'null'
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')
+    CACHE_DEFAULT_TTL = int(os.environ.get('CACHE_DEFAULT_TTL', 300))
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 1024))
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL')
+
+    # Cache-Control header per endpoint or blueprint, 'default' applies to the
+    # others, no-cache lets browsers and proxies keep pages but revalidate them
+    # with the ETag and Last-Modified the listing and detail pages send
+    CACHE_CONTROL_POLICIES = {
+        'venues': 'public, no-cache',
+        'artists': 'public, no-cache',
+        'shows': 'public, no-cache',
+        'show_venue': 'public, no-cache',
+        'show_artist': 'public, no-cache',
+        'autocomplete_venues': 'public, max-age=60',
+        'autocomplete_artists': 'public, max-age=60',
+        'api': 'public, no-cache',
+        'default': 'no-store',
+    }
+
+    # Per request query counting, Server-Timing headers and the slow query log
+    QUERY_STATS_ENABLED = True
+    SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', 200))
+
+    # Refresh the venue directory behind /venues in the transaction of every
+    # venue or show write, by default manage.py refresh_venue_directory does
+    # from cron, see models.directory.VenueDirectory.refresh_after_write
+    VENUE_DIRECTORY_REFRESH_ON_WRITE = os.environ.get('VENUE_DIRECTORY_REFRESH_ON_WRITE', '0') == '1'
+
+    # Rows fetched per round trip when streaming API collections
+    API_STREAM_CHUNK_SIZE = int(os.environ.get('API_STREAM_CHUNK_SIZE', 1000))
+
+    # The next_since of an export manifest is this much before exported_at,
+    # longer than any write transaction, so rows stamped before the export
+    # but committed after its snapshot are exported again next time
+    EXPORT_SINCE_OVERLAP_SECONDS = float(os.environ.get('EXPORT_SINCE_OVERLAP_SECONDS', 300))
+
+
+class DevelopmentConfig(Config):
+    # Enable debug mode.
+    DEBUG = True
+
+
+class ProductionConfig(Config):
+    # one pooled connection per gunicorn thread, see gunicorn.conf.py,
+    # overflow covers streamed API responses holding a connection longer
+    SECRET_KEY = os.environ.get('SECRET_KEY')
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(
+        Config.SQLALCHEMY_DATABASE_URI,
+        pool_size=int(os.environ.get('DB_POOL_SIZE', os.environ.get('WEB_THREADS', 4))),
+        max_overflow=int(os.environ.get('DB_MAX_OVERFLOW', 2)),
+        pool_recycle=int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        pool_timeout=int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        statement_timeout_ms=int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 5000)),
+    )
+
+
+configs = {
+    'development': DevelopmentConfig,
+    'production': ProductionConfig,
+}
 
 
-# TODO IMPLEMENT DATABASE URL
-SQLALCHEMY_DATABASE_URI = os.environ.get('SQLALCHEMY_DATABASE_URI')
-# SQLALCHEMY_TRACK_MODIFICATIONS = True
\ No newline at end of file
+def get_config(name=None):
+    # FYYUR_ENV, or FLASK_ENV, picks the configuration, development by default
+    name = name or os.environ.get('FYYUR_ENV') or os.environ.get('FLASK_ENV') or 'development'
+    config = configs[name]
+    if config is ProductionConfig and not config.SECRET_KEY:
+        raise RuntimeError('SECRET_KEY must be set in production, every worker needs the same one')
+    return config
@@ -0,0 +1,109 @@
+import csv
+import datetime
+import gzip
+import json
+import os
+
+from flask import current_app
+
+from models import db
+from models.artist import Artist
+from models.genre import ArtistGenre, Genre, VenueGenre
+from models.show import Show
+from models.venue import Venue
+
+
+def _changed(model, since):
+    return db.select([model.id]).where(model.updated_at >= since)
+
+
+# table: (model, filter of an incremental export), genre links have no
+# timestamp of their own, all links of a changed venue or artist are exported
+TABLES = {
+    'genres': (Genre, None),
+    'venues': (Venue, lambda since: Venue.updated_at >= since),
+    'artists': (Artist, lambda since: Artist.updated_at >= since),
+    'shows': (Show, lambda since: Show.updated_at >= since),
+    'venue_genre': (VenueGenre, lambda since: VenueGenre.venue_id.in_(_changed(Venue, since))),
+    'artist_genre': (ArtistGenre, lambda since: ArtistGenre.artist_id.in_(_changed(Artist, since))),
+}
+
+
+def _query(name, since=None):
+    model, changed = TABLES[name]
+    table = model.__table__
+    query = db.select([table]).order_by(*table.primary_key.columns)
+    if since is not None and changed is not None:
+        query = query.where(changed(since))
+    # a named cursor on postgres, rows are fetched chunk by chunk
+    return query.execution_options(stream_results=True)
+
+
+def _value(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat(sep=' ')
+    if isinstance(value, datetime.date):
+        return value.isoformat()
+    return value
+
+
+def _rows(result, chunk_size):
+    while True:
+        chunk = result.fetchmany(chunk_size)
+        if not chunk:
+            return
+        for row in chunk:
+            yield [_value(value) for value in row]
+
+
+def export_table(name, path, format='csv', since=None, chunk_size=10000):
+    # written next to path and renamed when complete, returns the row count
+    count = 0
+    partial = path + '.partial'
+    result = db.session.execute(_query(name, since))
+    try:
+        with gzip.open(partial, 'wt', encoding='utf-8', newline='', compresslevel=6) as file:
+            columns = list(result.keys())
+            if format == 'csv':
+                writer = csv.writer(file)
+                writer.writerow(columns)
+            for row in _rows(result, chunk_size):
+                if format == 'csv':
+                    writer.writerow(['' if value is None else value for value in row])
+                else:
+                    file.write(json.dumps(dict(zip(columns, row)), separators=(',', ':')) + '\n')
+                count += 1
+    finally:
+        result.close()
+    os.replace(partial, path)
+    return count
+
+
+def export(output, names=None, format='csv', since=None, chunk_size=10000):
+    # every table from one snapshot on postgres, next_since is the since of
+    # the next incremental export, rows changed in the overlap are exported twice
+    names = names or list(TABLES)
+    exported_at = datetime.datetime.utcnow()
+    overlap = datetime.timedelta(seconds=current_app.config.get('EXPORT_SINCE_OVERLAP_SECONDS', 300))
+    if db.engine.dialect.name == 'postgresql':
+        db.session.connection(execution_options={'isolation_level': 'REPEATABLE READ'})
+
+    os.makedirs(output, exist_ok=True)
+    counts = {}
+    try:
+        for name in names:
+            path = os.path.join(output, f'{name}.{format}.gz')
+            counts[name] = export_table(name, path, format, since, chunk_size)
+    finally:
+        db.session.rollback()
+
+    manifest = {
+        'exported_at': _value(exported_at),
+        'since': _value(since),
+        'next_since': _value(exported_at - overlap),
+        'format': format,
+        'tables': counts,
+    }
+    with open(os.path.join(output, 'manifest.json'), 'w') as file:
+        json.dump(manifest, file, indent=2)
+    return manifest
@@ -0,0 +1,42 @@
+import datetime
+from functools import lru_cache
+
+import babel.dates
+import dateutil.parser
+from babel import Locale
+
+# named patterns of the datetime filter, anything else is used as a babel pattern
+FORMATS = {
+    'full': "EEEE MMMM, d, y 'at' h:mma",
+    'medium': "EE MM, dd, y h:mma",
+}
+
+
+@lru_cache(maxsize=64)
+def compiled_pattern(format, locale):
+    # babel parses the pattern and the locale on every format_datetime call
+    return babel.dates.parse_pattern(FORMATS.get(format, format)), Locale.parse(locale)
+
+
+@lru_cache(maxsize=4096)
+def _format(value, format, locale):
+    # pages repeat the same few start times, tiles of one show or one night
+    pattern, locale = compiled_pattern(format, locale)
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=babel.dates.UTC)
+    return pattern.apply(value, locale)
+
+
+def format_datetime(value, format='medium', locale=babel.dates.LC_TIME):
+    if value is None:
+        return ''
+    if isinstance(value, str):
+        value = dateutil.parser.parse(value)
+    elif not isinstance(value, datetime.datetime):
+        value = datetime.datetime.combine(value, datetime.time())
+    return _format(value, format, locale)
+
+
+def clear_cache():
+    compiled_pattern.cache_clear()
+    _format.cache_clear()
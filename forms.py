@@ -1,16 +1,36 @@
 from datetime import datetime
 from flask_wtf import Form
 from wtforms import StringField, SelectField, SelectMultipleField, DateTimeField, BooleanField
-from wtforms.validators import DataRequired, AnyOf, URL
+from wtforms.validators import DataRequired, AnyOf, URL, ValidationError
+
+from models import db
+from models.artist import Artist
+from models.venue import Venue
+
+
+class Exists(object):
+    # looks up only the submitted id instead of offering every row as a choice
+    def __init__(self, model, message=None):
+        self.model = model
+        self.message = message or f'{model.__name__} not found'
+
+    def __call__(self, form, field):
+        try:
+            id = int(field.data)
+        except (TypeError, ValueError):
+            raise ValidationError(self.message)
+        if db.session.query(self.model.id).filter(self.model.id == id).first() is None:
+            raise ValidationError(self.message)
+
 
 class ShowForm(Form):
     artist_id = StringField(
         'artist_id',
-        validators=[DataRequired()]
+        validators=[DataRequired(), Exists(Artist)]
     )
     venue_id = StringField(
         'venue_id',
-        validators=[DataRequired()]
+        validators=[DataRequired(), Exists(Venue)]
     )
     start_time = DateTimeField(
         'start_time',
@@ -0,0 +1,44 @@
+from flask import current_app, g
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+from cache import MISSING
+from models.version import Version
+
+
+def cache_version(*names):
+    # one lookup per request for every fragment key built from these tables
+    versions = g.setdefault('_cache_versions', {})
+    if names not in versions:
+        values = Version.get_many(*names)
+        versions[names] = '.'.join(str(values[name]) for name in names)
+    return versions[names]
+
+
+class FragmentCacheExtension(Extension):
+    # {% cache key, ttl %}...{% endcache %}, ttl is optional and defaults
+    # to CACHE_DEFAULT_TTL, rendered markup is stored in the app's Cache
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        if parser.stream.skip_if('comma'):
+            args.append(parser.parse_expression())
+        else:
+            args.append(nodes.Const(None))
+
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(self.call_method('_cache', args), [], [], body).set_lineno(lineno)
+
+    def _cache(self, key, ttl, caller):
+        cache = current_app.extensions.get('cache')
+        if cache is None:
+            return caller()
+        key = f'fragment:{key}'
+        value = cache.get(key)
+        if value is MISSING:
+            value = str(caller())
+            cache.set(key, value, ttl)
+        return Markup(value)
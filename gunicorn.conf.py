@@ -0,0 +1,24 @@
+# gunicorn -c gunicorn.conf.py wsgi:app
+import multiprocessing
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:' + os.environ.get('PORT', '8000'))
+
+# requests mostly wait on the database, so each worker runs threads and
+# keeps one pooled connection per thread (DB_POOL_SIZE defaults to
+# WEB_THREADS), the database sees at most
+# workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('WEB_THREADS', 4))
+
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+
+# recycles workers so per process caches and fragmentation stay bounded
+max_requests = 10000
+max_requests_jitter = 1000
+
+accesslog = '-'
+errorlog = '-'
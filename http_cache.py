@@ -0,0 +1,89 @@
+import datetime
+import hashlib
+import json
+from functools import wraps
+
+from flask import current_app, g, make_response, request, session
+
+from models import db
+from models.version import Version
+
+
+def _etag(parts):
+    return hashlib.sha1(json.dumps([request.full_path, parts], default=str).encode()).hexdigest()
+
+
+def _not_modified(etag, last_modified):
+    # If-None-Match wins over If-Modified-Since, as in RFC 7232
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None)
+    return False
+
+
+def change_validators(changes, *names):
+    # changes is a row of timestamps and counts, None when the entity is missing
+    if changes is None:
+        return None, None
+    timestamps = [value for value in changes if isinstance(value, datetime.datetime)]
+    parts = [list(changes), Version.get_many(*names)] if names else list(changes)
+    return parts, max(timestamps) if timestamps else None
+
+
+def table_validators(*models):
+    # listing pages, the change counters cover deletes and venue directory
+    # refreshes, the newest updated_at of every table is read from its index
+    # and the time of the last bump from the counters
+    def validators(*args, **kwargs):
+        names = [model.__tablename__ for model in models]
+        versions = Version.get_many(*names)
+        timestamps = db.session.query(*[
+            db.session.query(db.func.max(model.updated_at)).as_scalar() for model in models
+        ] + [
+            db.session.query(db.func.max(Version.updated_at)).filter(Version.name.in_(names)).as_scalar()
+        ]).one()
+        timestamps = [value for value in timestamps if value is not None]
+        return versions, max(timestamps) if timestamps else None
+    return validators
+
+
+def conditional(validators):
+    # validators(**view_args) returns (etag parts, last modified) from cheap
+    # queries, a matching request is answered 304 before the view runs
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # a pending flash message is part of the page
+            if request.method not in ('GET', 'HEAD') or session.get('_flashes'):
+                return view(*args, **kwargs)
+
+            parts, last_modified = validators(*args, **kwargs)
+            if parts is None:
+                return view(*args, **kwargs)
+
+            # also keys the view's cached data, see app.cached_details
+            etag = g.etag = _etag(parts)
+            if _not_modified(etag, last_modified):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+            response.set_etag(etag, weak=True)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            return response
+        return wrapper
+    return decorator
+
+
+def _cache_control(response):
+    policies = current_app.config.get('CACHE_CONTROL_POLICIES', {})
+    policy = policies.get(request.endpoint) or policies.get(request.blueprint) or policies.get('default')
+    if policy and request.method in ('GET', 'HEAD') and response.status_code in (200, 304) \
+            and 'Cache-Control' not in response.headers:
+        response.headers['Cache-Control'] = policy
+    return response
+
+
+def init_http_cache(app):
+    app.after_request(_cache_control)
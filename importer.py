@@ -0,0 +1,232 @@
+import csv
+import datetime
+import gzip
+import json
+import multiprocessing
+from collections import deque, namedtuple
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from werkzeug.datastructures import MultiDict
+from wtforms import IntegerField
+from wtforms.validators import DataRequired
+
+from forms import ArtistForm, ShowForm, VenueForm
+from models import db
+from models.artist import Artist
+from models.bulk import IN_CHUNK, batched, insert_rows
+from models.counters import ShowRollover
+from models.genre import ArtistGenre, VenueGenre, genre_registry
+from models.search import fold_name
+from models.show import Show
+from models.venue import Venue
+
+FALSE_VALUES = ('', '0', 'f', 'false', 'n', 'no', 'off')
+
+
+class ShowImportForm(ShowForm):
+    # the ShowForm rules, except that artists and venues are looked up once per batch
+    artist_id = IntegerField('artist_id', validators=[DataRequired()])
+    venue_id = IntegerField('venue_id', validators=[DataRequired()])
+
+
+# columns are loaded from the form data, or from the row when the form
+# has no such field, defaults are the same for every row
+Kind = namedtuple('Kind', 'form model link_model link_column booleans columns defaults')
+
+KINDS = {
+    'venues': Kind(VenueForm, Venue, VenueGenre, 'venue_id', ('seeking_talent',), (
+        'name', 'city', 'state', 'address', 'phone', 'image_link', 'facebook_link',
+        'website', 'seeking_talent', 'seeking_description',
+    ), {'deleted': False}),
+    'artists': Kind(ArtistForm, Artist, ArtistGenre, 'artist_id', ('seeking_venue',), (
+        'name', 'city', 'state', 'phone', 'image_link', 'facebook_link',
+        'website', 'seeking_venue', 'seeking_description',
+    ), {}),
+    'shows': Kind(ShowImportForm, Show, None, None, (), ('artist_id', 'venue_id', 'start_time'), {}),
+}
+
+
+def _open(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def read_rows(path, format=None):
+    # one dict per record, nothing is read ahead, None for a line that is not json
+    format = format or ('csv' if '.csv' in path else 'ndjson')
+    with _open(path) as file:
+        if format == 'csv':
+            yield from csv.DictReader(file)
+            return
+        for line in file:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield None
+
+
+def _formdata(row, booleans):
+    formdata = MultiDict()
+    for key, value in row.items():
+        if value is None:
+            continue
+        if key in booleans:
+            if str(value).strip().lower() not in FALSE_VALUES:
+                formdata.add(key, 'y')
+        elif key == 'genres':
+            names = value if isinstance(value, list) else value.split(',')
+            for name in names:
+                if name.strip():
+                    formdata.add(key, name.strip())
+        else:
+            formdata.add(key, str(value))
+    return formdata
+
+
+def _errors(form):
+    return '; '.join(f'{field}: {message}' for field, messages in form.errors.items() for message in messages)
+
+
+def _lookup(query, column, values):
+    found = []
+    for chunk in batched(sorted(values), IN_CHUNK):
+        found.extend(query.filter(column.in_(chunk)).all())
+    return found
+
+
+def _validate(kind, rows):
+    # the genre choices are the registry's names, resolved to ids on load
+    choices = [(name, name) for _, name in genre_registry.choices()]
+    valid, rejected = [], []
+    for number, row in rows:
+        if not isinstance(row, dict):
+            rejected.append((number, 'not a json object'))
+            continue
+        form = kind.form(_formdata(row, kind.booleans), meta={'csrf': False})
+        if kind.link_model is not None:
+            form.genres.choices = choices
+        if form.validate():
+            data = form.data
+            data.update({column: row.get(column) for column in kind.columns if column not in data})
+            valid.append((number, data))
+        else:
+            rejected.append((number, _errors(form)))
+    return valid, rejected
+
+
+def _unique_names(model, valid, rejected):
+    # names are unique, case-insensitively as in exists
+    names = {data['name'].lower() for _, data in valid}
+    lower_name = db.func.lower(model.name)
+    taken = {name for name, in _lookup(db.session.query(lower_name), lower_name, names)}
+    unique = []
+    for number, data in valid:
+        name = data['name'].lower()
+        if name in taken:
+            rejected.append((number, f'name: {data["name"]} already exists'))
+        else:
+            taken.add(name)
+            unique.append((number, data))
+    return unique
+
+
+def _existing_shows(valid, rejected):
+    found = {}
+    for model, column in ((Artist, 'artist_id'), (Venue, 'venue_id')):
+        ids = {data[column] for _, data in valid}
+        found[column] = {id for id, in _lookup(db.session.query(model.id), model.id, ids)}
+    existing = []
+    for number, data in valid:
+        missing = [column for column in found if data[column] not in found[column]]
+        if missing:
+            rejected.append((number, '; '.join(f'{column}: {data[column]} not found' for column in missing)))
+        else:
+            existing.append((number, data))
+    return existing
+
+
+def load_batch(kind, rows):
+    # validate, insert the rows and their genre links in one transaction,
+    # returns the number loaded and (row number, errors) of the rejected ones
+    kind = KINDS[kind]
+    model = kind.model
+    valid, rejected = _validate(kind, rows)
+    if kind.link_model is None:
+        valid = _existing_shows(valid, rejected)
+    else:
+        valid = _unique_names(model, valid, rejected)
+
+    defaults = dict(kind.defaults, updated_at=datetime.datetime.utcnow())
+    columns = list(kind.columns) + list(defaults)
+    rows = [
+        [data[column] if data[column] != '' else None for column in kind.columns] + list(defaults.values())
+        for _, data in valid
+    ]
+    if kind.link_model is not None:
+        # core inserts skip the name validator
+        columns.append('name_key')
+        for row, (_, data) in zip(rows, valid):
+            row.append(fold_name(data['name']))
+    try:
+        insert_rows(model.__table__, columns, rows)
+        if kind.link_model is not None and valid:
+            # ids come from the database, looked up through the unique names
+            ids = dict(_lookup(db.session.query(model.name, model.id), model.name,
+                               {data['name'] for _, data in valid}))
+            links = {
+                (genre_registry.id(name), ids[data['name']])
+                for _, data in valid for name in data['genres']
+            }
+            insert_rows(kind.link_model.__table__, ['genre_id', kind.link_column], sorted(links))
+        if kind.link_model is None and valid:
+            # added to the counters of this batch's venues and artists only,
+            # other rows keep their updated_at
+            ShowRollover.count_batch([
+                (data['venue_id'], data['artist_id'], data['start_time']) for _, data in valid
+            ])
+        db.session.commit()
+    except IntegrityError as error:
+        # a name loaded by another batch at the same time
+        db.session.rollback()
+        rejected.extend((number, f'batch failed: {error.orig}') for number, _ in valid)
+        valid = []
+    finally:
+        db.session.close()
+    return len(valid), sorted(rejected)
+
+
+def _init_worker(app):
+    app.app_context().push()
+
+
+def _load_batches(kind, batches, workers):
+    if workers <= 1:
+        for batch in batches:
+            yield load_batch(kind, batch)
+        return
+
+    # children must not share the parent's connections
+    app = current_app._get_current_object()
+    db.session.remove()
+    db.engine.dispose()
+
+    context = multiprocessing.get_context('fork')
+    with context.Pool(workers, initializer=_init_worker, initargs=(app,)) as pool:
+        # at most two batches per worker are read ahead
+        pending = deque()
+        for batch in batches:
+            pending.append(pool.apply_async(load_batch, (kind, batch)))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().get()
+        while pending:
+            yield pending.popleft().get()
+
+
+def import_file(kind, path, format=None, batch_size=1000, workers=1):
+    # yields (loaded, rejected) per batch, in file order
+    rows = enumerate(read_rows(path, format), 1)
+    yield from _load_batches(kind, batched(rows, batch_size), workers)
@@ -1,15 +1,27 @@
 # ----------------------------------------------------------------------------#
 # Imports
 # ----------------------------------------------------------------------------#
+import datetime
+import json
+import random
 import sys
 
 from flask import Flask
-from flask_script import Manager
+from flask_script import Command, Manager, Option
+from config import engine_options, get_config
+from exporter import TABLES, export as export_tables
+from importer import KINDS, import_file
 from models import db
 from models.artist import Artist
+from models.bulk import batched, bulk_insert, next_id, reset_sequence
+from models.counters import ShowRollover
+from models.directory import VenueDirectory
 from models.genre import Genre, VenueGenre, ArtistGenre
+from models.partitions import create_partitions, detach_partitions, is_partitioned
+from models.search import fold_name
 from models.show import Show
 from models.venue import Venue
+from models.version import Version
 
 # ----------------------------------------------------------------------------#
 # App Config.
@@ -17,7 +29,9 @@ from models.venue import Venue
 # ----------------------------------------------------------------------------#
 
 app = Flask(__name__)
-app.config.from_object('config')
+app.config.from_object(get_config())
+# bulk loads and rebuilds are not held to the request statement timeout
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
 db.init_app(app)
 manager = Manager(app)
 
@@ -190,6 +204,10 @@ def seed_db():
         ]
         show_objs = [Show(**show) for show in shows]
         db.session.add_all(show_objs)
+        db.session.flush()
+        ShowRollover.recount()
+        VenueDirectory.refresh()
+        Version.bump('genres', 'venues', 'artists', 'shows')
         db.session.commit()
 
     except:
@@ -198,6 +216,305 @@ def seed_db():
     finally:
         db.session.close()
 
+# ----------------------------------------------------------------------------#
+# Synthetic data.
+# ----------------------------------------------------------------------------#
+
+# (city, state, weight) bigger markets get more venues and artists
+areas = [
+    ('New York', 'NY', 20), ('Los Angeles', 'CA', 16), ('Chicago', 'IL', 10),
+    ('San Francisco', 'CA', 9), ('Austin', 'TX', 8), ('Nashville', 'TN', 8),
+    ('Seattle', 'WA', 6), ('Atlanta', 'GA', 6), ('New Orleans', 'LA', 5),
+    ('Denver', 'CO', 4), ('Portland', 'OR', 4), ('Boston', 'MA', 4),
+    ('Detroit', 'MI', 3), ('Minneapolis', 'MN', 3), ('Miami', 'FL', 3),
+    ('Philadelphia', 'PA', 3), ('Phoenix', 'AZ', 2), ('Salt Lake City', 'UT', 2),
+    ('Kansas City', 'MO', 2), ('Burlington', 'VT', 1),
+]
+name_words = [
+    'Blue', 'Velvet', 'Electric', 'Golden', 'Midnight', 'Silver', 'Crimson', 'Broken',
+    'Wild', 'Lucky', 'Hollow', 'Neon', 'Rusty', 'Little', 'Grand', 'Secret',
+]
+venue_words = ['Room', 'Hall', 'Lounge', 'Tavern', 'Club', 'Theatre', 'Garden', 'Bar']
+artist_words = ['Band', 'Collective', 'Trio', 'Quartet', 'Project', 'Orchestra', 'Ensemble', 'Sound']
+
+
+def _weighted(rng, choices, weights, k):
+    # k distinct picks, weighted
+    picked = set()
+    while len(picked) < k:
+        picked.add(rng.choices(choices, weights)[0])
+    return picked
+
+
+def _ensure_genres(rng):
+    existing = {genre.name for genre in Genre.query.all()}
+    db.session.add_all([Genre(name=name) for name in genres if name not in existing])
+    db.session.commit()
+
+    # zipf-like popularity over a seeded ordering of the genres
+    genre_ids = sorted(genre.id for genre in Genre.query.all())
+    rng.shuffle(genre_ids)
+    return genre_ids, [1.0 / rank for rank in range(1, len(genre_ids) + 1)]
+
+
+def _entities(rng, first_id, count, words, extra):
+    area_weights = [area[2] for area in areas]
+    for id in range(first_id, first_id + count):
+        city, state, _ = rng.choices(areas, area_weights)[0]
+        name = f'{rng.choice(name_words)} {rng.choice(words)} {id}'
+        row = {
+            'id': id,
+            'name': name,
+            'name_key': fold_name(name),
+            'city': city,
+            'state': state,
+            'phone': f'{rng.randint(200, 999)}-{rng.randint(100, 999)}-{rng.randint(1000, 9999)}',
+            'image_link': f'https://picsum.photos/seed/{id}/300/300',
+            'facebook_link': f'https://www.facebook.com/fyyur{id}',
+            'seeking_description': None,
+        }
+        row.update(extra(id))
+        yield row
+
+
+def _genre_links(rng, owner_ids, genre_ids, genre_weights):
+    for owner_id in owner_ids:
+        for genre_id in _weighted(rng, genre_ids, genre_weights, rng.randint(1, 4)):
+            yield genre_id, owner_id
+
+
+def _load(table, rows, batch_size):
+    loaded = 0
+    columns = None
+    for batch in batched(rows, batch_size):
+        columns = columns or list(batch[0])
+        bulk_insert(table, columns, [[row[column] for column in columns] for row in batch])
+        loaded += len(batch)
+    return loaded
+
+
+@manager.option('--venues', dest='venue_count', type=int, default=1000)
+@manager.option('--artists', dest='artist_count', type=int, default=5000)
+@manager.option('--shows', dest='show_count', type=int, default=100000)
+@manager.option('--seed', dest='seed', type=int, default=42)
+@manager.option('--batch-size', dest='batch_size', type=int, default=10000)
+@manager.option('--anchor', dest='anchor', default=None,
+                help='YYYY-MM-DD that splits past and upcoming shows, defaults to today')
+@manager.option('--years-past', dest='years_past', type=float, default=3)
+@manager.option('--years-ahead', dest='years_ahead', type=float, default=1)
+def generate(venue_count, artist_count, show_count, seed, batch_size, anchor, years_past, years_ahead):
+    """Bulk load a reproducible synthetic dataset for load testing"""
+    rng = random.Random(seed)
+    anchor = datetime.datetime.strptime(anchor, '%Y-%m-%d') if anchor else \
+        datetime.datetime.combine(datetime.date.today(), datetime.time())
+
+    genre_ids, genre_weights = _ensure_genres(rng)
+    loaded_at = datetime.datetime.utcnow()
+
+    # ids are assigned here so shows and genre links need no round trips
+    venue_first = next_id(Venue.__table__)
+    artist_first = next_id(Artist.__table__)
+
+    venue_rows = _entities(rng, venue_first, venue_count, venue_words, lambda id: {
+        'address': f'{rng.randint(1, 9999)} {rng.choice(name_words)} Street',
+        'website': f'https://venue{id}.example.com',
+        'seeking_talent': rng.random() < 0.3,
+        'deleted': False,
+        'updated_at': loaded_at,
+    })
+    print('venues', _load(Venue.__table__, venue_rows, batch_size))
+
+    artist_rows = _entities(rng, artist_first, artist_count, artist_words, lambda id: {
+        'website': f'https://artist{id}.example.com' if rng.random() < 0.6 else None,
+        'seeking_venue': rng.random() < 0.4,
+        'updated_at': loaded_at,
+    })
+    print('artists', _load(Artist.__table__, artist_rows, batch_size))
+
+    venue_links = (
+        {'genre_id': genre_id, 'venue_id': venue_id}
+        for genre_id, venue_id in _genre_links(
+            rng, range(venue_first, venue_first + venue_count), genre_ids, genre_weights)
+    )
+    print('venue genres', _load(VenueGenre.__table__, venue_links, batch_size))
+
+    artist_links = (
+        {'genre_id': genre_id, 'artist_id': artist_id}
+        for genre_id, artist_id in _genre_links(
+            rng, range(artist_first, artist_first + artist_count), genre_ids, genre_weights)
+    )
+    print('artist genres', _load(ArtistGenre.__table__, artist_links, batch_size))
+
+    # busy venues and touring artists get most of the shows,
+    # start times on the half hour between years_past ago and years_ahead from anchor
+    past = int(years_past * 365 * 48)
+    ahead = int(years_ahead * 365 * 48)
+    show_rows = (
+        {
+            'artist_id': artist_first + int(artist_count * rng.random() ** 2),
+            'venue_id': venue_first + int(venue_count * rng.random() ** 1.5),
+            'start_time': anchor + datetime.timedelta(minutes=30 * rng.randint(-past, ahead)),
+            'updated_at': loaded_at,
+        }
+        for _ in range(show_count)
+    ) if venue_count and artist_count else iter(())
+    print('shows', _load(Show.__table__, show_rows, batch_size))
+
+    for table in (Venue.__table__, Artist.__table__, Show.__table__):
+        reset_sequence(table)
+
+    ShowRollover.recount()
+    VenueDirectory.refresh()
+    Version.bump('genres', 'venues', 'artists', 'shows')
+    db.session.commit()
+
+
+# ----------------------------------------------------------------------------#
+# Import.
+# ----------------------------------------------------------------------------#
+
+class Import(Command):
+    """Stream venues, artists or shows from a CSV or NDJSON file into the database"""
+    # a class because import is a keyword
+
+    option_list = (
+        Option('kind', choices=sorted(KINDS)),
+        Option('path', help='.csv or .ndjson, optionally gzipped'),
+        Option('--format', dest='format', choices=('csv', 'ndjson'), default=None,
+               help='defaults to the file extension'),
+        Option('--batch-size', dest='batch_size', type=int, default=1000),
+        Option('--workers', dest='workers', type=int, default=1,
+               help='processes validating and loading batches'),
+        Option('--rejects', dest='rejects', default=None,
+               help='write rejected rows and their errors to this NDJSON file'),
+    )
+
+    def run(self, kind, path, format, batch_size, workers, rejects):
+        loaded = rejected = 0
+        rejects_file = open(rejects, 'w') if rejects else None
+        try:
+            for batch_loaded, batch_rejected in import_file(kind, path, format, batch_size, workers):
+                loaded += batch_loaded
+                rejected += len(batch_rejected)
+                for number, errors in batch_rejected:
+                    if rejects_file:
+                        rejects_file.write(json.dumps({'row': number, 'errors': errors}) + '\n')
+                    elif rejected <= 10:
+                        print(f'row {number}: {errors}')
+                print(f'{loaded} loaded, {rejected} rejected', end='\r')
+        finally:
+            if rejects_file:
+                rejects_file.close()
+
+        if loaded:
+            names = [kind]
+            if kind == 'shows':
+                # counted per batch by the importer
+                names += ['venues', 'artists']
+            if 'venues' in names:
+                VenueDirectory.refresh()
+            Version.bump(*names)
+            db.session.commit()
+        print(f'{kind}: {loaded} loaded, {rejected} rejected')
+
+
+manager.add_command('import', Import())
+
+
+# ----------------------------------------------------------------------------#
+# Export.
+# ----------------------------------------------------------------------------#
+
+@manager.option('--output', dest='output', required=True, help='directory for the gzipped files')
+@manager.option('--tables', dest='tables', default=None,
+                help=f'comma separated, of {", ".join(TABLES)}, all by default')
+@manager.option('--format', dest='format', choices=('csv', 'ndjson'), default='csv')
+@manager.option('--since', dest='since', default=None,
+                help='only rows changed at or after this UTC time, YYYY-MM-DD[ HH:MM:SS]')
+@manager.option('--chunk-size', dest='chunk_size', type=int, default=10000)
+def export(output, tables, format, since, chunk_size):
+    """Write venues, artists, shows and genre links to gzipped CSV or NDJSON files"""
+    names = tables.split(',') if tables else None
+    unknown = set(names or ()) - set(TABLES)
+    if unknown:
+        print('unknown tables', ', '.join(sorted(unknown)))
+        return
+    since = datetime.datetime.fromisoformat(since) if since else None
+    manifest = export_tables(output, names, format, since, chunk_size)
+    for name, count in manifest['tables'].items():
+        print(name, count)
+    print('exported at', manifest['exported_at'])
+    print('next since', manifest['next_since'])
+
+
+# ----------------------------------------------------------------------------#
+# Show counters.
+# ----------------------------------------------------------------------------#
+
+@manager.command
+def roll_shows():
+    """Move shows that have started from the upcoming to the past counters"""
+    rolled = ShowRollover.roll()
+    rolled_through = ShowRollover.get_state(lock=True).rolled_through
+    if rolled:
+        VenueDirectory.refresh()
+        Version.bump('venues', 'artists')
+    db.session.commit()
+    print(f'rolled {rolled} shows through {rolled_through}')
+
+
+@manager.command
+def recount_shows():
+    """Rebuild the upcoming and past show counters of every venue and artist"""
+    ShowRollover.recount()
+    VenueDirectory.refresh()
+    Version.bump('venues', 'artists')
+    db.session.commit()
+    print('show counters rebuilt')
+
+
+@manager.command
+def refresh_venue_directory():
+    """Rebuild the venue directory the venues page reads from"""
+    VenueDirectory.refresh()
+    Version.bump('venues')
+    db.session.commit()
+    print('venue directory refreshed')
+
+
+# ----------------------------------------------------------------------------#
+# Show partitions.
+# ----------------------------------------------------------------------------#
+
+@manager.option('--months-ahead', dest='months_ahead', type=int, default=3)
+def create_show_partitions(months_ahead):
+    """Create the monthly shows partitions up to months_ahead from now"""
+    if not is_partitioned():
+        print('shows is not partitioned on this database')
+        return
+    created = create_partitions(months_ahead)
+    db.session.commit()
+    print('created', ', '.join(created) if created else 'nothing')
+
+
+@manager.option('--before', dest='before', required=True,
+                help='YYYY-MM-DD, months ending on or before this date are detached')
+@manager.option('--archive-schema', dest='archive_schema', default=None,
+                help='move detached partitions to this schema')
+@manager.option('--drop', dest='drop', action='store_true', default=False,
+                help='drop detached partitions')
+def detach_show_partitions(before, archive_schema, drop):
+    """Detach monthly shows partitions older than a date"""
+    if not is_partitioned():
+        print('shows is not partitioned on this database')
+        return
+    detached = detach_partitions(datetime.datetime.strptime(before, '%Y-%m-%d'), archive_schema, drop)
+    if detached:
+        Version.bump('shows')
+    db.session.commit()
+    print('detached', ', '.join(detached) if detached else 'nothing')
+
+
 # Default port:
 if __name__ == '__main__':
     manager.run()
\ No newline at end of file
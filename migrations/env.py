@@ -3,6 +3,7 @@ from __future__ import with_statement
 import logging
 from logging.config import fileConfig
 
+import sqlalchemy as sa
 from sqlalchemy import engine_from_config
 from sqlalchemy import pool
 
@@ -27,6 +28,26 @@ config.set_main_option(
         'SQLALCHEMY_DATABASE_URI').replace('%', '%%'))
 target_metadata = current_app.extensions['migrate'].db.metadata
 
+
+def include_object(object, name, type_, reflected, compare_to):
+    # search indexes and FTS tables are managed by hand in their migration
+    from models.search import is_search_object
+    if reflected and is_search_object(name):
+        return False
+    # monthly show partitions are created and detached by manage.py
+    from models.partitions import is_partition
+    if type_ == 'table' and reflected and is_partition(name):
+        return False
+    # a materialized view on postgres, which autogenerate would take for a missing table
+    if type_ == 'table' and name == 'venue_directory':
+        return False
+    # expression indexes such as lower(name) cannot be reflected, so they
+    # would be reported as new on every autogenerate
+    if type_ == 'index' and not reflected and \
+            any(not isinstance(expression, sa.Column) for expression in object.expressions):
+        return False
+    return True
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -83,6 +104,7 @@ def run_migrations_online():
             connection=connection,
             target_metadata=target_metadata,
             process_revision_directives=process_revision_directives,
+            include_object=include_object,
             **current_app.extensions['migrate'].configure_args
         )
 
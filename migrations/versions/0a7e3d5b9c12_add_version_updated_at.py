@@ -0,0 +1,29 @@
+"""add version updated_at
+
+Revision ID: 0a7e3d5b9c12
+Revises: f1c6a9d4b273
+Create Date: 2026-10-18 23:02:11.604318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0a7e3d5b9c12'
+down_revision = 'f1c6a9d4b273'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # when each counter was last bumped, left empty until then, the newest
+    # updated_at of the tables it tracks still bounds Last-Modified
+    op.add_column('versions', sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute('ALTER TABLE versions DROP COLUMN updated_at')
+    else:
+        op.drop_column('versions', 'updated_at')
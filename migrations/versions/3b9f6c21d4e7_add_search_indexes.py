@@ -0,0 +1,78 @@
+"""add search indexes
+
+Revision ID: 3b9f6c21d4e7
+Revises: dfef3c89a443
+Create Date: 2026-10-18 10:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b9f6c21d4e7'
+down_revision = 'dfef3c89a443'
+branch_labels = None
+depends_on = None
+
+SEARCH_TABLES = {
+    'venues': 'venues_search',
+    'artists': 'artists_search',
+}
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for table in SEARCH_TABLES:
+            for column in ('name', 'city'):
+                op.create_index(
+                    f'ix_{table}_{column}_trgm', table, [column],
+                    postgresql_using='gin',
+                    postgresql_ops={column: 'gin_trgm_ops'}
+                )
+
+    elif dialect == 'sqlite':
+        # external content FTS5 tables, the trigram tokenizer gives
+        # case-insensitive substring matching like pg_trgm
+        for table, search_table in SEARCH_TABLES.items():
+            op.execute(
+                f"CREATE VIRTUAL TABLE {search_table} USING fts5("
+                f"name, city, content='{table}', content_rowid='id', tokenize='trigram')"
+            )
+            op.execute(
+                f"CREATE TRIGGER {search_table}_ai AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {search_table}(rowid, name, city) VALUES (new.id, new.name, new.city); "
+                f"END"
+            )
+            op.execute(
+                f"CREATE TRIGGER {search_table}_ad AFTER DELETE ON {table} BEGIN "
+                f"INSERT INTO {search_table}({search_table}, rowid, name, city) "
+                f"VALUES ('delete', old.id, old.name, old.city); "
+                f"END"
+            )
+            op.execute(
+                f"CREATE TRIGGER {search_table}_au AFTER UPDATE OF name, city ON {table} BEGIN "
+                f"INSERT INTO {search_table}({search_table}, rowid, name, city) "
+                f"VALUES ('delete', old.id, old.name, old.city); "
+                f"INSERT INTO {search_table}(rowid, name, city) VALUES (new.id, new.name, new.city); "
+                f"END"
+            )
+            op.execute(f"INSERT INTO {search_table}({search_table}) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        for table in SEARCH_TABLES:
+            for column in ('name', 'city'):
+                op.drop_index(f'ix_{table}_{column}_trgm', table_name=table)
+
+    elif dialect == 'sqlite':
+        for search_table in SEARCH_TABLES.values():
+            for suffix in ('ai', 'ad', 'au'):
+                op.execute(f'DROP TRIGGER IF EXISTS {search_table}_{suffix}')
+            op.execute(f'DROP TABLE IF EXISTS {search_table}')
@@ -0,0 +1,58 @@
+"""add show counters
+
+Revision ID: 5e9b1f3c7a20
+Revises: a4d8e2b6c150
+Create Date: 2026-10-18 15:02:11.482913
+
+"""
+import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e9b1f3c7a20'
+down_revision = 'a4d8e2b6c150'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    for table in ('venues', 'artists'):
+        op.add_column(table, sa.Column('upcoming_show_count', sa.Integer(), server_default='0', nullable=False))
+        op.add_column(table, sa.Column('past_show_count', sa.Integer(), server_default='0', nullable=False))
+
+    show_rollover = op.create_table('show_rollover',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('rolled_through', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    rolled_through = datetime.datetime.now()
+    op.bulk_insert(show_rollover, [{'id': 1, 'rolled_through': rolled_through}])
+
+    # counts for the shows already in the table
+    shows = sa.table('shows', sa.column('venue_id'), sa.column('artist_id'), sa.column('start_time'))
+    for table, column in (('venues', shows.c.venue_id), ('artists', shows.c.artist_id)):
+        owners = sa.table(table, sa.column('id'), sa.column('upcoming_show_count'), sa.column('past_show_count'))
+
+        def counted(condition):
+            return sa.select([sa.func.count()]).select_from(shows).where(
+                column == owners.c.id
+            ).where(condition).as_scalar()
+
+        op.execute(owners.update().values(
+            upcoming_show_count=counted(shows.c.start_time > rolled_through),
+            past_show_count=counted(shows.c.start_time <= rolled_through)
+        ))
+
+
+def downgrade():
+    op.drop_table('show_rollover')
+    for table in ('artists', 'venues'):
+        for column in ('past_show_count', 'upcoming_show_count'):
+            if op.get_bind().dialect.name == 'sqlite':
+                # sqlite 3.35 drops columns in place, a batch copy would lose the search triggers
+                op.execute(f'ALTER TABLE {table} DROP COLUMN {column}')
+            else:
+                op.drop_column(table, column)
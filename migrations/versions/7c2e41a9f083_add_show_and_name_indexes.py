@@ -0,0 +1,36 @@
+"""add show and name indexes
+
+Revision ID: 7c2e41a9f083
+Revises: 3b9f6c21d4e7
+Create Date: 2026-10-18 12:03:17.552106
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2e41a9f083'
+down_revision = '3b9f6c21d4e7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_shows_venue_id_start_time', 'shows', ['venue_id', 'start_time'])
+    op.create_index('ix_shows_artist_id_start_time', 'shows', ['artist_id', 'start_time'])
+    op.create_index('ix_shows_start_time_id', 'shows', ['start_time', 'id'])
+    op.create_index('ix_venues_lower_name', 'venues', [sa.text('lower(name)')])
+    op.create_index('ix_artists_lower_name', 'artists', [sa.text('lower(name)')])
+    op.create_index('ix_venue_genre_venue_id', 'venue_genre', ['venue_id'])
+    op.create_index('ix_artist_genre_artist_id', 'artist_genre', ['artist_id'])
+
+
+def downgrade():
+    op.drop_index('ix_artist_genre_artist_id', table_name='artist_genre')
+    op.drop_index('ix_venue_genre_venue_id', table_name='venue_genre')
+    op.drop_index('ix_artists_lower_name', table_name='artists')
+    op.drop_index('ix_venues_lower_name', table_name='venues')
+    op.drop_index('ix_shows_start_time_id', table_name='shows')
+    op.drop_index('ix_shows_artist_id_start_time', table_name='shows')
+    op.drop_index('ix_shows_venue_id_start_time', table_name='shows')
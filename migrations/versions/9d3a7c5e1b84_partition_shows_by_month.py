@@ -0,0 +1,122 @@
+"""partition shows by month
+
+Revision ID: 9d3a7c5e1b84
+Revises: 5e9b1f3c7a20
+Create Date: 2026-10-18 16:41:37.209544
+
+"""
+import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d3a7c5e1b84'
+down_revision = '5e9b1f3c7a20'
+branch_labels = None
+depends_on = None
+
+# partitions created ahead of the current month, manage.py create_partitions
+# keeps adding them afterwards
+MONTHS_AHEAD = 3
+
+SHOW_INDEXES = [
+    ('ix_shows_venue_id_start_time', ['venue_id', 'start_time']),
+    ('ix_shows_artist_id_start_time', ['artist_id', 'start_time']),
+    ('ix_shows_start_time_id', ['start_time', 'id']),
+]
+
+
+def _add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime.datetime(index // 12, index % 12 + 1, 1)
+
+
+def _drop_show_indexes(table):
+    for name, _ in SHOW_INDEXES:
+        op.drop_index(name, table_name=table)
+
+
+def _create_show_indexes():
+    for name, columns in SHOW_INDEXES:
+        op.create_index(name, 'shows', columns)
+
+
+def upgrade():
+    bind = op.get_bind()
+    missing = bind.execute(sa.text('SELECT count(*) FROM shows WHERE start_time IS NULL')).scalar()
+    if missing:
+        raise RuntimeError(f'{missing} shows have no start_time, set or delete them before upgrading')
+
+    if bind.dialect.name != 'postgresql':
+        # sqlite keeps a single table
+        with op.batch_alter_table('shows') as batch_op:
+            batch_op.alter_column('start_time', existing_type=sa.DateTime(), nullable=False)
+        return
+
+    op.rename_table('shows', 'shows_unpartitioned')
+    op.execute('ALTER TABLE shows_unpartitioned RENAME CONSTRAINT shows_pkey TO shows_unpartitioned_pkey')
+    _drop_show_indexes('shows_unpartitioned')
+
+    # the partition key has to be part of the primary key, ids still come
+    # from the existing sequence so they stay unique on their own
+    op.execute(
+        "CREATE TABLE shows ("
+        "id integer NOT NULL DEFAULT nextval('shows_id_seq'::regclass), "
+        "artist_id integer NOT NULL REFERENCES artists (id), "
+        "venue_id integer NOT NULL REFERENCES venues (id), "
+        "start_time timestamp without time zone NOT NULL, "
+        "CONSTRAINT shows_pkey PRIMARY KEY (id, start_time)"
+        ") PARTITION BY RANGE (start_time)"
+    )
+    op.execute('CREATE TABLE shows_default PARTITION OF shows DEFAULT')
+
+    oldest = bind.execute(sa.text('SELECT min(start_time) FROM shows_unpartitioned')).scalar()
+    now = datetime.datetime.now()
+    month = datetime.datetime((oldest or now).year, (oldest or now).month, 1)
+    last = _add_months(datetime.datetime(now.year, now.month, 1), MONTHS_AHEAD)
+    while month <= last:
+        op.execute(
+            f"CREATE TABLE shows_y{month.year:04d}m{month.month:02d} PARTITION OF shows "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+        )
+        month = _add_months(month, 1)
+
+    op.execute(
+        'INSERT INTO shows (id, artist_id, venue_id, start_time) '
+        'SELECT id, artist_id, venue_id, start_time FROM shows_unpartitioned'
+    )
+    op.execute('ALTER SEQUENCE shows_id_seq OWNED BY shows.id')
+    op.drop_table('shows_unpartitioned')
+    _create_show_indexes()
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        with op.batch_alter_table('shows') as batch_op:
+            batch_op.alter_column('start_time', existing_type=sa.DateTime(), nullable=True)
+        return
+
+    op.rename_table('shows', 'shows_partitioned')
+    op.execute('ALTER TABLE shows_partitioned RENAME CONSTRAINT shows_pkey TO shows_partitioned_pkey')
+    _drop_show_indexes('shows_partitioned')
+
+    op.execute(
+        "CREATE TABLE shows ("
+        "id integer NOT NULL DEFAULT nextval('shows_id_seq'::regclass), "
+        "artist_id integer NOT NULL REFERENCES artists (id), "
+        "venue_id integer NOT NULL REFERENCES venues (id), "
+        "start_time timestamp without time zone, "
+        "CONSTRAINT shows_pkey PRIMARY KEY (id)"
+        ")"
+    )
+    # detached partitions are not copied back
+    op.execute(
+        'INSERT INTO shows (id, artist_id, venue_id, start_time) '
+        'SELECT id, artist_id, venue_id, start_time FROM shows_partitioned'
+    )
+    op.execute('ALTER SEQUENCE shows_id_seq OWNED BY shows.id')
+    op.drop_table('shows_partitioned')
+    _create_show_indexes()
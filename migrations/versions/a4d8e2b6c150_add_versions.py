@@ -0,0 +1,32 @@
+"""add versions
+
+Revision ID: a4d8e2b6c150
+Revises: 7c2e41a9f083
+Create Date: 2026-10-18 13:26:54.104771
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a4d8e2b6c150'
+down_revision = '7c2e41a9f083'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    versions = op.create_table('versions',
+    sa.Column('name', sa.String(length=50), nullable=False),
+    sa.Column('value', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    op.bulk_insert(versions, [
+        {'name': name, 'value': 1}
+        for name in ('artists', 'genres', 'shows', 'venues')
+    ])
+
+
+def downgrade():
+    op.drop_table('versions')
@@ -0,0 +1,33 @@
+"""add name prefix indexes
+
+Revision ID: b61f0e2d4c97
+Revises: 9d3a7c5e1b84
+Create Date: 2026-10-18 17:24:05.918361
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b61f0e2d4c97'
+down_revision = '9d3a7c5e1b84'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # autocomplete ranges over lower(name) in byte order, the default
+    # collation index cannot answer them on postgresql, ix_*_lower_name
+    # already does on sqlite
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.create_index('ix_venues_lower_name_prefix', 'venues', [sa.text('lower(name) COLLATE "C"')])
+    op.create_index('ix_artists_lower_name_prefix', 'artists', [sa.text('lower(name) COLLATE "C"')])
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    op.drop_index('ix_artists_lower_name_prefix', table_name='artists')
+    op.drop_index('ix_venues_lower_name_prefix', table_name='venues')
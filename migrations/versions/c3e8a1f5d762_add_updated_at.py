@@ -0,0 +1,41 @@
+"""add updated_at
+
+Revision ID: c3e8a1f5d762
+Revises: b61f0e2d4c97
+Create Date: 2026-10-18 18:12:48.330157
+
+"""
+import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e8a1f5d762'
+down_revision = 'b61f0e2d4c97'
+branch_labels = None
+depends_on = None
+
+TABLES = ('venues', 'artists', 'shows')
+
+
+def upgrade():
+    # existing rows count as changed now, sqlite cannot add a column with a
+    # non constant default so the value is filled in afterwards
+    now = datetime.datetime.utcnow()
+    for table in TABLES:
+        op.add_column(table, sa.Column('updated_at', sa.DateTime(), nullable=True))
+        updated = sa.table(table, sa.column('updated_at'))
+        op.execute(updated.update().values(updated_at=now))
+        op.create_index(op.f(f'ix_{table}_updated_at'), table, ['updated_at'], unique=False)
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        op.drop_index(op.f(f'ix_{table}_updated_at'), table_name=table)
+        if op.get_bind().dialect.name == 'sqlite':
+            # sqlite 3.35 drops columns in place, a batch copy would lose the search triggers
+            op.execute(f'ALTER TABLE {table} DROP COLUMN updated_at')
+        else:
+            op.drop_column(table, 'updated_at')
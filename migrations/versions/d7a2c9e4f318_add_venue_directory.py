@@ -0,0 +1,45 @@
+"""add venue directory
+
+Revision ID: d7a2c9e4f318
+Revises: c3e8a1f5d762
+Create Date: 2026-10-18 19:20:41.512907
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7a2c9e4f318'
+down_revision = 'c3e8a1f5d762'
+branch_labels = None
+depends_on = None
+
+SELECT = 'SELECT id, name, city, state, upcoming_show_count FROM venues'
+
+
+def upgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        # the unique index lets REFRESH MATERIALIZED VIEW CONCURRENTLY run
+        op.execute(f'CREATE MATERIALIZED VIEW venue_directory AS {SELECT} WITH DATA')
+        op.create_index('ix_venue_directory_id', 'venue_directory', ['id'], unique=True)
+    else:
+        op.create_table(
+            'venue_directory',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(), nullable=True),
+            sa.Column('city', sa.String(length=120), nullable=True),
+            sa.Column('state', sa.String(length=120), nullable=True),
+            sa.Column('upcoming_show_count', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.execute(f'INSERT INTO venue_directory (id, name, city, state, upcoming_show_count) {SELECT}')
+    op.create_index('ix_venue_directory_area', 'venue_directory', ['state', 'city', 'id'], unique=False)
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('DROP MATERIALIZED VIEW venue_directory')
+    else:
+        op.drop_index('ix_venue_directory_area', table_name='venue_directory')
+        op.drop_table('venue_directory')
@@ -0,0 +1,28 @@
+"""index venue directory area keys
+
+Revision ID: e5b8d1c3a926
+Revises: d7a2c9e4f318
+Create Date: 2026-10-18 20:05:12.408311
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b8d1c3a926'
+down_revision = 'd7a2c9e4f318'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # keyset pagination orders nullable text columns as coalesce(column, '')
+    op.drop_index('ix_venue_directory_area', table_name='venue_directory')
+    op.create_index('ix_venue_directory_area', 'venue_directory',
+                    [sa.text("coalesce(state, '')"), sa.text("coalesce(city, '')"), 'id'])
+
+
+def downgrade():
+    op.drop_index('ix_venue_directory_area', table_name='venue_directory')
+    op.create_index('ix_venue_directory_area', 'venue_directory', ['state', 'city', 'id'], unique=False)
@@ -0,0 +1,54 @@
+"""add name keys
+
+Revision ID: f1c6a9d4b273
+Revises: e5b8d1c3a926
+Create Date: 2026-10-18 21:14:37.520914
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1c6a9d4b273'
+down_revision = 'e5b8d1c3a926'
+branch_labels = None
+depends_on = None
+
+TABLES = ('venues', 'artists')
+
+
+def upgrade():
+    # autocomplete ranges over the casefolded name instead of lower(name),
+    # which sqlite only folds for ascii, byte ordered on postgres
+    for table in TABLES:
+        op.add_column(table, sa.Column(
+            'name_key', sa.String().with_variant(postgresql.VARCHAR(collation='C'), 'postgresql'), nullable=True
+        ))
+
+        # models.search.fold_name, written without touching updated_at
+        rows = sa.table(table, sa.column('id'), sa.column('name'), sa.column('name_key'))
+        connection = op.get_bind()
+        keys = [
+            {'row_id': id, 'key': name.casefold()}
+            for id, name in connection.execute(sa.select([rows.c.id, rows.c.name]).where(rows.c.name.isnot(None)))
+        ]
+        if keys:
+            connection.execute(
+                rows.update().where(rows.c.id == sa.bindparam('row_id')).values(name_key=sa.bindparam('key')),
+                keys
+            )
+        op.create_index(f'ix_{table}_name_key', table, ['name_key'])
+
+        if connection.dialect.name == 'postgresql':
+            op.drop_index(f'ix_{table}_lower_name_prefix', table_name=table)
+
+
+def downgrade():
+    for table in reversed(TABLES):
+        if op.get_bind().dialect.name == 'postgresql':
+            op.create_index(f'ix_{table}_lower_name_prefix', table, [sa.text('lower(name) COLLATE "C"')])
+        op.drop_index(f'ix_{table}_name_key', table_name=table)
+        # sqlite 3.35 drops columns in place, a batch copy would lose the search triggers
+        op.drop_column(table, 'name_key')
@@ -1,4 +1,118 @@
-from flask_sqlalchemy import SQLAlchemy
+import os
+import time
+import traceback
 
-db = SQLAlchemy()
+from flask import current_app, g, has_app_context
+from flask_sqlalchemy import SignallingSession, SQLAlchemy
+from sqlalchemy import event, orm
+from sqlalchemy.engine import Engine
 
+
+class RoutingSession(SignallingSession):
+    # statements go to the replica engine a read only view picked, see
+    # models.replicas, flushes and every other request use the primary
+
+    def get_bind(self, mapper=None, clause=None):
+        if not self._flushing and has_app_context():
+            engine = g.get('_replica_engine')
+            if engine is not None:
+                return engine
+        return super().get_bind(mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+db = RoutingSQLAlchemy()
+
+# the project root, frames below it are reported as call sites
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class QueryStats(object):
+
+    def __init__(self, keep=5):
+        self.keep = keep
+        self.count = 0
+        self.duration = 0.0
+        self.rows = 0
+        self.slowest = []
+
+    def record(self, statement, duration, rows):
+        self.count += 1
+        self.duration += duration
+        if rows and rows > 0:
+            self.rows += rows
+        if len(self.slowest) < self.keep or duration > self.slowest[-1][0]:
+            self.slowest.append((duration, statement))
+            self.slowest.sort(key=lambda item: item[0], reverse=True)
+            del self.slowest[self.keep:]
+
+    @property
+    def server_timing(self):
+        return 'db;dur={:.2f};desc="{} queries"'.format(self.duration * 1000, self.count)
+
+    def __repr__(self):
+        return f'<QueryStats count: {self.count} duration: {self.duration * 1000:.2f}ms rows: {self.rows}>'
+
+
+def get_query_stats():
+    # statements run in the current app context, one context per request
+    if not has_app_context():
+        return None
+    if '_query_stats' not in g:
+        g._query_stats = QueryStats()
+    return g._query_stats
+
+
+def _call_site():
+    # innermost frame of our own code that issued the statement
+    here = os.path.abspath(__file__)
+    for frame in reversed(traceback.extract_stack()):
+        filename = os.path.abspath(frame.filename)
+        if filename.startswith(ROOT) and filename != here:
+            return f'{os.path.relpath(filename, ROOT)}:{frame.lineno} in {frame.name}'
+    return 'unknown'
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info['query_started'].pop()
+    stats = get_query_stats()
+    if stats is None or not current_app.config.get('QUERY_STATS_ENABLED', True):
+        return
+
+    stats.record(statement, duration, cursor.rowcount)
+
+    threshold = current_app.config.get('SLOW_QUERY_MS')
+    if threshold is not None and duration * 1000 >= threshold:
+        current_app.logger.warning(
+            'slow query %.1fms at %s: %s', duration * 1000, _call_site(), ' '.join(statement.split())
+        )
+
+
+def _reset_query_stats():
+    # an app context can outlive a request, e.g. under a manage.py command
+    g._query_stats = QueryStats()
+
+
+def _add_server_timing(response):
+    stats = get_query_stats()
+    if stats is not None and stats.count and current_app.config.get('QUERY_STATS_ENABLED', True):
+        response.headers.add('Server-Timing', stats.server_timing)
+    return response
+
+
+def init_query_stats(app):
+    # every engine, so replica and migration engines are counted as well
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    app.before_request(_reset_query_stats)
+    app.after_request(_add_server_timing)
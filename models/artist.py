@@ -1,7 +1,12 @@
 import datetime
 
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import validates
+
 from models import db
-from models.genre import ArtistGenre
+from models.genre import ArtistGenre, genre_registry
+from models.pagination import paginate
+from models.search import fold_name, prefix_search, search
 from models.show import Show
 
 
@@ -10,6 +15,9 @@ class Artist(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, unique=True)
+    # fold_name(name), kept by _fold_name and set by the bulk loaders, compared
+    # in byte order by autocomplete
+    name_key = db.Column(db.String().with_variant(postgresql.VARCHAR(collation='C'), 'postgresql'), index=True)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     phone = db.Column(db.String(120))
@@ -18,35 +26,47 @@ class Artist(db.Model):
     seeking_venue = db.Column(db.Boolean, default=False)
     seeking_description = db.Column(db.Text)
     website = db.Column(db.String(200))
+    # kept by models.counters.ShowRollover, listings read these instead of counting shows
+    upcoming_show_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_show_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # set on every ORM or core insert and update, drives Last-Modified
+    updated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow, index=True)
 
     shows = db.relationship('Show', backref='artists', lazy=True)
     genres = db.relationship('Genre', secondary='artist_genre', viewonly=True)
 
-    def add_genres(self, items):
-        return [
-            ArtistGenre(artist_id=self.id, genre_id=genre)
-            for genre in items
-        ]
+    # backs the case-insensitive name check in exists
+    __table_args__ = (
+        db.Index('ix_artists_lower_name', db.func.lower(name)),
+    )
+
+    @validates('name')
+    def _fold_name(self, key, name):
+        self.name_key = fold_name(name)
+        return name
 
     def get_genres(self):
-        return [genre.name for genre in self.genres]
+        # names come from the registry, only the artist_genre rows are loaded
+        return [genre_registry.name(link.genre_id) for link in self.artist_genre]
 
-    def update_genres(self, genres):
-        #  genres in db
-        venue_genres_in_db = ArtistGenre.get_genres_ids(artist_id=self.id)
+    def get_genre_ids(self):
+        # form values, from the same links as get_genres
+        return [str(link.genre_id) for link in self.artist_genre]
 
-        # generate a list of new genres not in db
-        genres_to_insert = list(set(genres) - set(venue_genres_in_db))
-        if genres_to_insert:
-            genres_objs = self.add_genres(genres_to_insert)
-            db.session.add_all(genres_objs)
+    def sync_genres(self, genre_ids, current=None):
+        # genre links live in another table, the artist row is touched for them
+        if ArtistGenre.sync(self.id, genre_ids, current):
+            self.updated_at = datetime.datetime.utcnow()
+
+    @classmethod
+    def autocomplete(cls, prefix, limit=None):
+        return [{'id': artist.id, 'name': artist.name} for artist in prefix_search(cls, prefix, limit=limit)]
 
     @classmethod
-    def get_enum(cls):
-        return [
-            (artist.id, artist.name)
-            for artist in cls.query.with_entities(cls.id, cls.name).all()
-        ]
+    def get_all(cls, after=None, before=None, limit=None):
+        query = cls.query.with_entities(cls.id, cls.name)
+        page = paginate(query, [cls.id], after=after, before=before, limit=limit)
+        return page._replace(items=[{'id': artist.id, 'name': artist.name} for artist in page.items])
 
     @classmethod
     def get_by_id(cls, id):
@@ -54,10 +74,11 @@ class Artist(db.Model):
 
     @classmethod
     def get_by_id_full(cls, id):
+        # two queries however many shows: the artist with its genre links,
+        # then its shows joined to venue names
         details = {}
-        artist = cls.get_by_id(id)
-        past_shows = Show.get_past_by_venue(id)
-        upcoming_shows = Show.get_upcoming_by_artist(id)
+        artist = cls.query.options(db.joinedload(cls.artist_genre)).filter_by(id=id).first_or_404()
+        past_shows, upcoming_shows = Show.get_split_by_artist(id)
         details.update(artist.serialize)
         details.update({'upcoming_shows': upcoming_shows})
         details.update({'upcoming_shows_count': len(upcoming_shows)})
@@ -67,12 +88,13 @@ class Artist(db.Model):
         return details
 
     @classmethod
-    def get_artists_by_name(cls, name):
-        artists = cls.query.filter(cls.name.ilike(f'%{name}%')).outerjoin(Show, cls.id == Show.artist_id).all()
+    def get_artists_by_name(cls, name, limit=None):
+        # ranked match on name, city or genre
+        artists = search(cls, ArtistGenre, ArtistGenre.artist_id, name, limit=limit)
         return [{
             "id": artist.id,
             "name": artist.name,
-            "num_upcoming_shows": artist.num_upcoming_shows
+            "num_upcoming_shows": artist.upcoming_show_count
         } for artist in artists]
 
     @classmethod
@@ -81,21 +103,11 @@ class Artist(db.Model):
 
     @property
     def num_upcoming_shows(self):
-        return self.query.join(Show).filter_by(artist_id=self.id).filter(
-            Show.start_time > datetime.datetime.now()).count()
+        return self.upcoming_show_count
 
     @property
     def num_past_shows(self):
-        return self.query.join(Show).filter_by(artist_id=self.id).filter(
-            Show.start_time < datetime.datetime.now()).count()
-
-    @property
-    def past_shows(self):
-        return Show.get_past_by_artist(self.id)
-
-    @property
-    def upcoming_shows(self):
-        return Show.get_upcoming_by_artist(self.id)
+        return self.past_show_count
 
     @property
     def serialize(self):
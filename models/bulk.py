@@ -0,0 +1,63 @@
+import csv
+import io
+from itertools import islice
+
+from models import db
+
+# bound parameters per IN list, under the sqlite limit
+IN_CHUNK = 900
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def next_id(table):
+    return (db.session.query(db.func.max(table.c.id)).scalar() or 0) + 1
+
+
+def reset_sequence(table):
+    # rows inserted with explicit ids do not advance the postgres sequence
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(db.text(
+            f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+            f"coalesce((SELECT max(id) FROM {table.name}), 0) + 1, false)"
+        ))
+        db.session.commit()
+
+
+def _copy(table, columns, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(['' if value is None else value for value in row])
+    buffer.seek(0)
+
+    # the session's own connection, the copy is part of its transaction
+    cursor = db.session.connection().connection.cursor()
+    cursor.copy_expert(
+        f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+    )
+
+
+def insert_rows(table, columns, rows):
+    # COPY on postgres, a single executemany elsewhere, the caller commits
+    if not rows:
+        return
+    if db.engine.dialect.name == 'postgresql':
+        _copy(table, columns, rows)
+    else:
+        db.session.execute(table.insert(), [dict(zip(columns, row)) for row in rows])
+
+
+def bulk_insert(table, columns, rows):
+    # one transaction per call
+    if not rows:
+        return
+    insert_rows(table, columns, rows)
+    db.session.commit()
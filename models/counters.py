@@ -0,0 +1,115 @@
+import datetime
+
+from models import db
+from models.artist import Artist
+from models.show import Show
+from models.venue import Venue
+
+# tables that keep upcoming_show_count and past_show_count, and the shows
+# column that points at them
+COUNTED = [
+    (Venue.__table__, Show.venue_id),
+    (Artist.__table__, Show.artist_id),
+]
+
+
+class ShowRollover(db.Model):
+    # single row, shows starting at or before rolled_through are counted as past
+    __tablename__ = 'show_rollover'
+
+    id = db.Column(db.Integer, primary_key=True)
+    rolled_through = db.Column(db.DateTime, nullable=False)
+
+    @classmethod
+    def get_state(cls, lock=False):
+        # roll holds the row for update, new shows hold it for share so a
+        # show committed during a roll is never counted on the wrong side
+        query = cls.query.filter_by(id=1)
+        query = query.with_for_update() if lock else query.with_for_update(read=True)
+        state = query.first()
+        if state is None:
+            state = cls(id=1, rolled_through=datetime.datetime.now())
+            db.session.add(state)
+            db.session.flush()
+            cls.recount(state)
+        return state
+
+    @classmethod
+    def count_new(cls, venue_id, artist_id, start_time):
+        if start_time is None:
+            return
+        state = cls.get_state()
+        counter = 'past_show_count' if start_time <= state.rolled_through else 'upcoming_show_count'
+        for table, column in COUNTED:
+            owner_id = venue_id if column is Show.venue_id else artist_id
+            db.session.execute(
+                table.update().where(table.c.id == owner_id).values({counter: table.c[counter] + 1})
+            )
+
+    @classmethod
+    def count_batch(cls, shows):
+        # count_new for many (venue_id, artist_id, start_time), one executemany
+        # of per owner differences per table, so batches loaded at the same
+        # time and count_new add to each other instead of overwriting
+        state = cls.get_state()
+        for table, column in COUNTED:
+            deltas = {}
+            for venue_id, artist_id, start_time in shows:
+                if start_time is None:
+                    continue
+                owner_id = venue_id if column is Show.venue_id else artist_id
+                delta = deltas.setdefault(owner_id, {'owner_id': owner_id, 'upcoming': 0, 'past': 0})
+                delta['past' if start_time <= state.rolled_through else 'upcoming'] += 1
+            if deltas:
+                # rows are locked in id order, concurrent batches cannot deadlock
+                db.session.execute(
+                    table.update().where(table.c.id == db.bindparam('owner_id')).values(
+                        upcoming_show_count=table.c.upcoming_show_count + db.bindparam('upcoming'),
+                        past_show_count=table.c.past_show_count + db.bindparam('past')
+                    ),
+                    [deltas[owner_id] for owner_id in sorted(deltas)]
+                )
+
+    @classmethod
+    def roll(cls, now=None):
+        # moves shows that started since the last roll from upcoming to past,
+        # one GROUP BY per table and one executemany of the differences
+        now = now or datetime.datetime.now()
+        state = cls.get_state(lock=True)
+        if now <= state.rolled_through:
+            return 0
+
+        started = (Show.start_time > state.rolled_through, Show.start_time <= now)
+        # every show counts once, whatever number of tables it moves in
+        rolled = db.session.query(db.func.count(Show.id)).filter(*started).scalar()
+        for table, column in COUNTED if rolled else ():
+            moved = db.session.query(column, db.func.count(Show.id)).filter(*started).group_by(column).all()
+            if moved:
+                db.session.execute(
+                    table.update().where(table.c.id == db.bindparam('owner_id')).values(
+                        upcoming_show_count=table.c.upcoming_show_count - db.bindparam('moved'),
+                        past_show_count=table.c.past_show_count + db.bindparam('moved')
+                    ),
+                    [{'owner_id': owner_id, 'moved': count} for owner_id, count in moved]
+                )
+
+        state.rolled_through = now
+        return rolled
+
+    @classmethod
+    def recount(cls, state=None):
+        # rebuilds every counter from shows, for repairs and bulk loads
+        state = state or cls.get_state(lock=True)
+        for table, column in COUNTED:
+            def counted(condition):
+                return db.select([db.func.count(Show.id)]).where(
+                    column == table.c.id
+                ).where(condition).as_scalar()
+
+            db.session.execute(table.update().values(
+                upcoming_show_count=counted(Show.start_time > state.rolled_through),
+                past_show_count=counted(Show.start_time <= state.rolled_through)
+            ))
+
+    def __repr__(self):
+        return f'<ShowRollover rolled_through: {self.rolled_through}>'
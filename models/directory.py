@@ -0,0 +1,52 @@
+from flask import current_app
+
+from models import db
+
+
+class VenueDirectory(db.Model):
+    # the venues page, one row per venue with its area and upcoming show
+    # count: a materialized view on postgres, a summary table elsewhere,
+    # created by the add_venue_directory migration and rebuilt by refresh
+    __tablename__ = 'venue_directory'
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String)
+    city = db.Column(db.String(120))
+    state = db.Column(db.String(120))
+    upcoming_show_count = db.Column(db.Integer, nullable=False)
+
+    # the page order, see Venue.get_all, nullable keys are paged as ''
+    __table_args__ = (
+        db.Index('ix_venue_directory_area', db.func.coalesce(state, ''), db.func.coalesce(city, ''), id),
+    )
+
+    @classmethod
+    def refresh(cls, venue_ids=None):
+        # part of the caller's transaction, readers keep the old rows until it
+        # commits, the summary table can rebuild only the rows of venue_ids
+        if db.engine.dialect.name == 'postgresql':
+            # needs the unique index on id, reads are not blocked
+            db.session.execute('REFRESH MATERIALIZED VIEW CONCURRENTLY venue_directory')
+            return
+        from models.venue import Venue
+        columns = [column.name for column in cls.__table__.columns]
+        delete = cls.__table__.delete()
+        select = db.select([getattr(Venue, column) for column in columns])
+        if venue_ids is not None:
+            delete = delete.where(cls.id.in_(venue_ids))
+            select = select.where(Venue.id.in_(venue_ids))
+        db.session.execute(delete)
+        db.session.execute(cls.__table__.insert().from_select(columns, select))
+
+    @classmethod
+    def refresh_after_write(cls, *venue_ids):
+        # off by default, manage.py refresh_venue_directory runs from cron
+        # instead: on postgres the refresh holds an exclusive lock on the view
+        # until the write commits, which serializes every venue and show write
+        if current_app.config.get('VENUE_DIRECTORY_REFRESH_ON_WRITE', False):
+            # the session's pending changes are part of the rows
+            db.session.flush()
+            cls.refresh(venue_ids)
+
+    def __repr__(self):
+        return f'<VenueDirectory name={self.name} >'
@@ -1,4 +1,45 @@
+import threading
+import time
+
+from flask import current_app
+from sqlalchemy.dialects import postgresql
+
 from models import db
+from models.version import Version
+
+
+def _insert_ignoring_duplicates(table):
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        return postgresql.insert(table).on_conflict_do_nothing()
+    if dialect == 'sqlite':
+        return table.insert().prefix_with('OR IGNORE')
+    return table.insert()
+
+
+def _sync(link_model, owner_column, owner_id, genre_ids, current=None):
+    # at most one DELETE and one INSERT, the caller commits, True on changes
+    desired = {int(genre_id) for genre_id in genre_ids or ()}
+    if current is None:
+        current = {
+            genre_id for genre_id, in
+            db.session.query(link_model.genre_id).filter(owner_column == owner_id)
+        }
+    current = set(current)
+
+    removed = current - desired
+    if removed:
+        db.session.query(link_model).filter(owner_column == owner_id).filter(
+            link_model.genre_id.in_(removed)
+        ).delete(synchronize_session=False)
+
+    added = desired - current
+    if added:
+        db.session.execute(_insert_ignoring_duplicates(link_model.__table__), [
+            {'genre_id': genre_id, owner_column.key: owner_id}
+            for genre_id in sorted(added)
+        ])
+    return bool(removed or added)
 
 
 class Genre(db.Model):
@@ -23,6 +64,57 @@ class Genre(db.Model):
         return f'<Genre name = {self.name}/>'
 
 
+class GenreRegistry(object):
+    # every genre in memory, one per process, reloaded when the 'genres'
+    # version changes, which is checked at most every GENRE_REGISTRY_CHECK_SECONDS
+
+    def __init__(self):
+        self.names = {}
+        self.ids = {}
+        self.version = None
+        self.checked = None
+        self._lock = threading.Lock()
+
+    def _fresh(self):
+        interval = current_app.config.get('GENRE_REGISTRY_CHECK_SECONDS', 30)
+        return self.checked is not None and time.monotonic() - self.checked < interval
+
+    def load(self):
+        if self._fresh():
+            return
+        with self._lock:
+            if self._fresh():
+                return
+            # version first, a write in between only causes another reload
+            version = Version.get_many('genres')['genres']
+            if version != self.version:
+                rows = db.session.query(Genre.id, Genre.name).order_by(Genre.id).all()
+                self.names = dict(rows)
+                self.ids = {name: id for id, name in rows}
+                self.version = version
+            self.checked = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self.version = None
+            self.checked = None
+
+    def choices(self):
+        self.load()
+        return list(self.names.items())
+
+    def name(self, genre_id):
+        self.load()
+        return self.names.get(int(genre_id))
+
+    def id(self, name):
+        self.load()
+        return self.ids.get(name)
+
+
+genre_registry = GenreRegistry()
+
+
 class ArtistGenre(db.Model):
     __tablename__ = 'artist_genre'
 
@@ -32,17 +124,16 @@ class ArtistGenre(db.Model):
     genre = db.relationship('Genre', backref=db.backref('artist_genre', cascade='all, delete-orphan'))
     artist = db.relationship('Artist', backref=db.backref('artist_genre', cascade='all, delete-orphan'))
 
-    __table_args__ = (db.UniqueConstraint(genre_id, artist_id),)
-
-    @classmethod
-    def delete_old(cls, artist_id, genres):
-        venues_to_delete = db.session.query(cls).filter_by(artist_id=artist_id).filter(cls.genre_id.notin_(genres))
-        venues_to_delete.delete(synchronize_session=False)
+    __table_args__ = (
+        db.UniqueConstraint(genre_id, artist_id),
+        db.Index('ix_artist_genre_artist_id', artist_id),
+    )
 
     @classmethod
-    def get_genres_ids(cls, artist_id):
-        results = cls.query.filter_by(artist_id=artist_id).all()
-        return [str(result.genre_id) for result in results]
+    def sync(cls, artist_id, genre_ids, current=None):
+        # current is the set of linked genre ids when the caller knows it,
+        # an empty tuple for a new artist
+        return _sync(cls, cls.artist_id, artist_id, genre_ids, current)
 
     def __repr__(self):
         return f'<ArtistGenre artist {self.artist_id} genre {self.artist_id}>'
@@ -57,17 +148,16 @@ class VenueGenre(db.Model):
     genre = db.relationship('Genre', backref=db.backref('venue_genre', cascade='all, delete-orphan'))
     venue = db.relationship('Venue', backref=db.backref('venue_genre', cascade='all, delete-orphan'))
 
-    __table_args__ = (db.UniqueConstraint(genre_id, venue_id),)
-
-    @classmethod
-    def delete_old(cls, venue_id, genres):
-        venues_to_delete = db.session.query(cls).filter_by(venue_id=venue_id).filter(cls.genre_id.notin_(genres))
-        venues_to_delete.delete(synchronize_session=False)
+    __table_args__ = (
+        db.UniqueConstraint(genre_id, venue_id),
+        db.Index('ix_venue_genre_venue_id', venue_id),
+    )
 
     @classmethod
-    def get_genres_ids(cls, venue_id):
-        results = cls.query.filter_by(venue_id=venue_id).all()
-        return [str(result.genre_id) for result in results]
+    def sync(cls, venue_id, genre_ids, current=None):
+        # current is the set of linked genre ids when the caller knows it,
+        # an empty tuple for a new venue
+        return _sync(cls, cls.venue_id, venue_id, genre_ids, current)
 
     def __repr__(self):
         return f'<VenreGenre venue {self.venue_id} genre {self.genre_id}>'
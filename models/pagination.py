@@ -0,0 +1,126 @@
+import base64
+import datetime
+import json
+import operator
+from collections import namedtuple
+
+from flask import abort, current_app
+
+from models import db
+
+Page = namedtuple('Page', ['items', 'next', 'prev'])
+
+
+def page_size(limit=None):
+    default = current_app.config.get('PAGE_SIZE', 50)
+    maximum = current_app.config.get('MAX_PAGE_SIZE', 200)
+    if not limit or limit < 1:
+        return default
+    return min(limit, maximum)
+
+
+def _sort_key(column):
+    # nullable text columns are ordered and compared as '' instead of NULL,
+    # a plain comparison with NULL is never true and would skip those rows
+    expression = column.expression
+    if getattr(expression, 'nullable', False) and isinstance(expression.type, db.String):
+        return db.func.coalesce(column, '')
+    return column
+
+
+def _is_text_key(column):
+    return _sort_key(column) is not column
+
+
+def encode_cursor(values):
+    values = [
+        value.isoformat() if isinstance(value, datetime.datetime) else value
+        for value in values
+    ]
+    raw = json.dumps(values, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _decode_value(column, value):
+    # only scalars of the column's type reach the query
+    column_type = column.expression.type
+    if isinstance(column_type, db.DateTime):
+        if value is None:
+            return None
+        if not isinstance(value, str):
+            raise ValueError(value)
+        return datetime.datetime.fromisoformat(value)
+    if isinstance(column_type, db.Integer):
+        if isinstance(value, bool) or not isinstance(value, int):
+            raise ValueError(value)
+        return value
+    if isinstance(column_type, db.String):
+        if value is None and not _is_text_key(column):
+            return None
+        if not isinstance(value, str):
+            raise ValueError(value)
+        return value
+    if isinstance(value, (list, dict)):
+        raise ValueError(value)
+    return value
+
+
+def decode_cursor(cursor, columns):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw.decode())
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError(cursor)
+        return [_decode_value(column, value) for column, value in zip(columns, values)]
+    except (ValueError, TypeError):
+        abort(400)
+
+
+def _keyset(keys, values, compare, bound):
+    # a row value comparison, (a, b) > (x, y), is an index range on sqlite
+    # 3.15+ and postgres, spelled out with OR it scans from the first row,
+    # the bound on the first key alone lets sqlite range over expression
+    # indexes such as the coalesced venue directory keys
+    return db.and_(
+        compare(db.tuple_(*keys), db.tuple_(*[
+            db.literal(value, type_=key.type) for key, value in zip(keys, values)
+        ])),
+        bound(keys[0], values[0])
+    )
+
+
+def paginate(query, columns, after=None, before=None, limit=None):
+    limit = page_size(limit)
+    keys = [_sort_key(column) for column in columns]
+
+    if before:
+        values = decode_cursor(before, columns)
+        rows = query.filter(
+            _keyset(keys, values, operator.lt, operator.le)
+        ).order_by(*[key.desc() for key in keys]).limit(limit + 1).all()
+        has_prev = len(rows) > limit
+        rows = list(reversed(rows[:limit]))
+        has_next = True
+    else:
+        if after:
+            values = decode_cursor(after, columns)
+            query = query.filter(
+                _keyset(keys, values, operator.gt, operator.ge)
+            )
+        rows = query.order_by(*keys).limit(limit + 1).all()
+        has_next = len(rows) > limit
+        rows = rows[:limit]
+        has_prev = bool(after)
+
+    def cursor(row):
+        values = [getattr(row, column.key) for column in columns]
+        return encode_cursor([
+            '' if value is None and _is_text_key(column) else value
+            for column, value in zip(columns, values)
+        ])
+
+    return Page(
+        items=rows,
+        next=cursor(rows[-1]) if rows and has_next else None,
+        prev=cursor(rows[0]) if rows and has_prev else None
+    )
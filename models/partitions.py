@@ -0,0 +1,106 @@
+import datetime
+import re
+
+from models import db
+
+# on postgresql shows is range partitioned by start_time, one table per month
+# named shows_yYYYYmMM, and shows_default for rows outside every month
+PARENT = 'shows'
+DEFAULT_PARTITION = 'shows_default'
+_monthly = re.compile(r'^shows_y(\d{4})m(\d{2})$')
+
+
+def is_partition(name):
+    # partitions and detached partitions, autogenerate should ignore them
+    return name == DEFAULT_PARTITION or _monthly.match(name) is not None
+
+
+def is_partitioned():
+    bind = db.session.get_bind()
+    if bind.dialect.name != 'postgresql':
+        return False
+    return bind.execute(db.text(
+        'SELECT count(*) FROM pg_partitioned_table JOIN pg_class ON pg_class.oid = partrelid '
+        'WHERE relname = :name AND pg_table_is_visible(pg_class.oid)'
+    ), name=PARENT).scalar() > 0
+
+
+def month_start(value):
+    return datetime.datetime(value.year, value.month, 1)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return datetime.datetime(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f'shows_y{month.year:04d}m{month.month:02d}'
+
+
+def partition_month(name):
+    match = _monthly.match(name)
+    if match is None:
+        return None
+    return datetime.datetime(int(match.group(1)), int(match.group(2)), 1)
+
+
+def get_partitions():
+    # monthly partitions currently attached to shows, oldest first
+    rows = db.session.execute(db.text(
+        'SELECT child.relname FROM pg_inherits '
+        'JOIN pg_class parent ON parent.oid = pg_inherits.inhparent '
+        'JOIN pg_class child ON child.oid = pg_inherits.inhrelid '
+        'WHERE parent.relname = :parent'
+    ), {'parent': PARENT})
+    return sorted(name for name, in rows if partition_month(name) is not None)
+
+
+def create_partition(month):
+    name = partition_name(month)
+    bounds = {'lower': month, 'upper': add_months(month, 1)}
+
+    # shows already stored in the default partition for this month move to the
+    # new table before it is attached, attach fails while the default holds them
+    db.session.execute(db.text(f'CREATE TABLE {name} (LIKE {PARENT} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'))
+    db.session.execute(db.text(
+        f'INSERT INTO {name} SELECT * FROM {DEFAULT_PARTITION} '
+        'WHERE start_time >= :lower AND start_time < :upper'
+    ), bounds)
+    db.session.execute(db.text(
+        f'DELETE FROM {DEFAULT_PARTITION} WHERE start_time >= :lower AND start_time < :upper'
+    ), bounds)
+    db.session.execute(db.text(
+        f"ALTER TABLE {PARENT} ATTACH PARTITION {name} "
+        f"FOR VALUES FROM ('{bounds['lower'].isoformat()}') TO ('{bounds['upper'].isoformat()}')"
+    ))
+    return name
+
+
+def create_partitions(months_ahead=3, now=None):
+    # the current month and the next months_ahead, existing ones are kept
+    first = month_start(now or datetime.datetime.now())
+    existing = set(get_partitions())
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(first, offset)
+        if partition_name(month) not in existing:
+            created.append(create_partition(month))
+    return created
+
+
+def detach_partitions(before, archive_schema=None, drop=False):
+    # partitions whose whole month is before the given date leave shows,
+    # detached tables keep their rows until archived elsewhere or dropped
+    detached = []
+    for name in get_partitions():
+        if add_months(partition_month(name), 1) > before:
+            continue
+        db.session.execute(db.text(f'ALTER TABLE {PARENT} DETACH PARTITION {name}'))
+        if drop:
+            db.session.execute(db.text(f'DROP TABLE {name}'))
+        elif archive_schema:
+            db.session.execute(db.text(f'CREATE SCHEMA IF NOT EXISTS {archive_schema}'))
+            db.session.execute(db.text(f'ALTER TABLE {name} SET SCHEMA {archive_schema}'))
+        detached.append(name)
+    return detached
@@ -0,0 +1,171 @@
+import random
+import threading
+import time
+from collections import deque
+from functools import wraps
+
+from flask import current_app, g, has_request_context, session
+from sqlalchemy import event
+from sqlalchemy.exc import DBAPIError
+
+from models import RoutingSession, db
+from models.artist import Artist
+from models.show import Show
+from models.venue import Venue
+from models.version import Version
+
+REPLICA_PREFIX = 'replica'
+
+# when the user last wrote, in their session cookie
+WRITTEN_AT = '_db_written_at'
+
+# primary high water marks remembered with the time they were first seen
+SEEN_HIGH_WATER = 256
+
+# seconds since the last replayed transaction, 0 once everything received
+# is replayed, NULL before the first one
+REPLAY_LAG = db.text(
+    'SELECT CASE WHEN NOT pg_is_in_recovery() OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() '
+    'THEN 0 ELSE extract(epoch FROM now() - pg_last_xact_replay_timestamp()) END'
+)
+
+
+def replica_binds():
+    return sorted(bind for bind in current_app.config.get('SQLALCHEMY_BINDS') or {}
+                  if bind.startswith(REPLICA_PREFIX))
+
+
+def _high_water(engine):
+    # the sum of the change counters and the newest change of every table,
+    # a replica that has caught up has the same row as the primary
+    row = db.select([
+        db.select([db.func.coalesce(db.func.sum(Version.value), 0)]).as_scalar(),
+        db.select([db.func.max(Venue.updated_at)]).as_scalar(),
+        db.select([db.func.max(Artist.updated_at)]).as_scalar(),
+        db.select([db.func.max(Show.updated_at)]).as_scalar(),
+    ])
+    with engine.connect() as connection:
+        return tuple(connection.execute(row).first())
+
+
+def _replay_lag(engine):
+    with engine.connect() as connection:
+        lag = connection.execute(REPLAY_LAG).scalar()
+    return float('inf') if lag is None else max(float(lag), 0.0)
+
+
+def _behind(primary, replica):
+    for primary_value, replica_value in zip(primary, replica):
+        if primary_value is None:
+            continue
+        if replica_value is None or replica_value < primary_value:
+            return True
+    return False
+
+
+class ReplicaMonitor(object):
+    # replica lag in seconds, one per process, measured at most every
+    # REPLICA_LAG_CHECK_SECONDS, None for a replica that cannot be reached
+
+    def __init__(self):
+        self.lags = {}
+        self.checked = {}
+        self.seen = deque(maxlen=SEEN_HIGH_WATER)
+        self._lock = threading.Lock()
+
+    def _fresh(self, bind):
+        interval = current_app.config.get('REPLICA_LAG_CHECK_SECONDS', 5)
+        checked = self.checked.get(bind)
+        return checked is not None and time.monotonic() - checked < interval
+
+    def _since_seen(self, primary, replica):
+        # elsewhere the replica is behind since the primary first showed a
+        # high water mark it has not reached, off by up to one check interval
+        now = time.monotonic()
+        if not self.seen or self.seen[-1][0] != primary:
+            self.seen.append((primary, now))
+        for high_water, seen_at in self.seen:
+            if _behind(high_water, replica):
+                return now - seen_at
+        return 0.0
+
+    def _measure(self, bind):
+        engine = db.get_engine(bind=bind)
+        try:
+            # the standby reports its own replay delay on postgres
+            if engine.dialect.name == 'postgresql':
+                return _replay_lag(engine)
+            primary = _high_water(db.get_engine())
+            replica = _high_water(engine)
+        except DBAPIError as error:
+            current_app.logger.warning('replica %s unavailable: %s', bind, error)
+            return None
+        return self._since_seen(primary, replica)
+
+    def lag(self, bind):
+        if self._fresh(bind):
+            return self.lags.get(bind)
+        with self._lock:
+            if not self._fresh(bind):
+                self.lags[bind] = self._measure(bind)
+                self.checked[bind] = time.monotonic()
+            return self.lags.get(bind)
+
+    def invalidate(self):
+        with self._lock:
+            self.lags = {}
+            self.checked = {}
+
+
+replica_monitor = ReplicaMonitor()
+
+
+def _recently_written():
+    written_at = session.get(WRITTEN_AT)
+    window = current_app.config.get('READ_YOUR_WRITES_SECONDS', 15)
+    return written_at is not None and time.time() - written_at < window
+
+
+def use_replica():
+    # picks a replica for the rest of the request, returns its bind or None
+    # when the primary serves it: no replicas, a recent write of this user,
+    # or every replica lagging more than REPLICA_MAX_LAG_SECONDS
+    binds = replica_binds()
+    if not binds or _recently_written():
+        return None
+    max_lag = current_app.config.get('REPLICA_MAX_LAG_SECONDS', 5)
+    lags = {bind: replica_monitor.lag(bind) for bind in binds}
+    healthy = [bind for bind, lag in lags.items() if lag is not None and lag <= max_lag]
+    if not healthy:
+        return None
+    bind = random.choice(healthy)
+    g._replica_engine = db.get_engine(bind=bind)
+    return bind
+
+
+def read_only(view):
+    # outermost after the route, so conditional validators read the replica too
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        use_replica()
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def _flushed(db_session, flush_context):
+    # the rest of the request reads its own write from the primary
+    if has_request_context():
+        g._db_written = True
+        g.pop('_replica_engine', None)
+
+
+def _remember_write(response):
+    if g.get('_db_written'):
+        session[WRITTEN_AT] = time.time()
+    return response
+
+
+def init_replicas(app):
+    if not event.contains(RoutingSession, 'after_flush', _flushed):
+        event.listen(RoutingSession, 'after_flush', _flushed)
+    app.after_request(_remember_write)
@@ -0,0 +1,149 @@
+from flask import current_app
+
+from models import db
+from models.genre import Genre
+
+# full text tables kept by the search migration, one per searchable table:
+#   postgresql - pg_trgm GIN indexes on name and city
+#   sqlite     - FTS5 trigram tables over name and city, kept by triggers
+TRIGRAM_INDEXES = {
+    'venues': ('ix_venues_name_trgm', 'ix_venues_city_trgm'),
+    'artists': ('ix_artists_name_trgm', 'ix_artists_city_trgm'),
+}
+FTS_TABLES = {
+    'venues': 'venues_search',
+    'artists': 'artists_search',
+}
+
+# trigram matching needs at least three characters
+MIN_TRIGRAM_LENGTH = 3
+
+_fts_available = {}
+
+
+def is_search_object(name):
+    # objects created by the search migration that autogenerate should ignore
+    if any(name in indexes for indexes in TRIGRAM_INDEXES.values()):
+        return True
+    return any(name == table or name.startswith(table + '_') for table in FTS_TABLES.values())
+
+
+def result_limit(limit=None):
+    maximum = current_app.config.get('SEARCH_RESULT_LIMIT', 50)
+    if not limit or limit < 1:
+        return maximum
+    return min(limit, maximum)
+
+
+def autocomplete_limit(limit=None):
+    default = current_app.config.get('AUTOCOMPLETE_LIMIT', 10)
+    return result_limit(limit or default)
+
+
+def fold_name(name):
+    # the autocomplete key of a name, stored in name_key: python folds case
+    # the same on every database, sqlite lower() only folds ascii
+    return None if name is None else name.casefold()
+
+
+def prefix_search(model, prefix, limit=None):
+    prefix = fold_name((prefix or '').strip())
+    if not prefix:
+        return []
+    # a range scan of the name_key index, which is byte ordered on postgres too
+    key = model.name_key
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return db.session.query(model.id, model.name).filter(
+        key >= prefix, key < upper
+    ).order_by(key).limit(autocomplete_limit(limit)).all()
+
+
+def _like_pattern(term):
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+def _columns(model):
+    return model.id, model.name, model.upcoming_show_count
+
+
+def _genre_owners(link_model, owner_column, pattern):
+    # genres is a small table, ids of entities linked to a matching genre
+    return db.select([owner_column.label('id')]).select_from(
+        link_model.__table__.join(Genre.__table__, Genre.id == link_model.genre_id)
+    ).where(Genre.name.ilike(pattern, escape='\\'))
+
+
+def _has_fts(table):
+    bind = db.session.get_bind()
+    key = (str(bind.url), table)
+    if key not in _fts_available:
+        _fts_available[key] = bind.execute(
+            db.text("SELECT count(*) FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            name=FTS_TABLES[table]
+        ).scalar() > 0
+    return _fts_available[key]
+
+
+def _search_trigram(model, link_model, owner_column, term, limit):
+    pattern = _like_pattern(term)
+    score = db.func.greatest(
+        db.func.similarity(model.name, term),
+        db.func.similarity(model.city, term)
+    )
+
+    # a union of selects that can each use an index, the gin_trgm_ops
+    # indexes answer ILIKE '%term%', postgres cannot use them for an OR
+    # that also holds an IN subquery
+    candidates = db.union(
+        db.select([model.id]).where(model.name.ilike(pattern, escape='\\')),
+        db.select([model.id]).where(model.city.ilike(pattern, escape='\\')),
+        _genre_owners(link_model, owner_column, pattern)
+    ).alias('candidates')
+    return db.session.query(*_columns(model)).join(
+        candidates, candidates.c.id == model.id
+    ).order_by(score.desc(), model.name).limit(limit).all()
+
+
+def _search_fts(model, link_model, owner_column, term, limit):
+    pattern = _like_pattern(term)
+    fts_name = FTS_TABLES[model.__tablename__]
+    fts = db.table(fts_name, db.column('rowid'), db.column('rank'))
+
+    # a quoted phrase is a substring match with the trigram tokenizer,
+    # genre only matches rank after every text match
+    text_matches = db.select([
+        fts.c.rowid.label('id'), fts.c.rank.label('rank')
+    ]).where(db.text(f'{fts_name} MATCH :match'))
+    genre_matches = _genre_owners(link_model, owner_column, pattern).column(db.literal(0).label('rank'))
+    matches = db.union_all(text_matches, genre_matches).alias('matches')
+
+    best = db.func.min(matches.c.rank)
+    return db.session.query(*_columns(model)).join(
+        matches, matches.c.id == model.id
+    ).group_by(*_columns(model)).order_by(best, model.name).limit(limit).params(
+        match='"{}"'.format(term.replace('"', '""'))
+    ).all()
+
+
+def _search_like(model, link_model, owner_column, term, limit):
+    pattern = _like_pattern(term)
+    return db.session.query(*_columns(model)).filter(db.or_(
+        model.name.ilike(pattern, escape='\\'),
+        model.city.ilike(pattern, escape='\\'),
+        model.id.in_(_genre_owners(link_model, owner_column, pattern))
+    )).order_by(model.name).limit(limit).all()
+
+
+def search(model, link_model, owner_column, term, limit=None):
+    term = (term or '').strip()
+    if not term:
+        return []
+    limit = result_limit(limit)
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        return _search_trigram(model, link_model, owner_column, term, limit)
+    if dialect == 'sqlite' and len(term) >= MIN_TRIGRAM_LENGTH and _has_fts(model.__tablename__):
+        return _search_fts(model, link_model, owner_column, term, limit)
+    return _search_like(model, link_model, owner_column, term, limit)
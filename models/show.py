@@ -1,5 +1,6 @@
 import datetime
 from models import db
+from models.pagination import paginate
 
 
 class Show(db.Model):
@@ -8,53 +9,111 @@ class Show(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     artist_id = db.Column(db.Integer, db.ForeignKey('artists.id'), nullable=False)
     venue_id = db.Column(db.Integer, db.ForeignKey('venues.id'), nullable=False)
-    start_time = db.Column(db.DateTime)
+    # on postgresql the primary key is (id, start_time), shows is partitioned
+    # by month on start_time, see models.partitions
+    start_time = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow, index=True)
 
     artist = db.relationship('Artist', viewonly=True)
     venue = db.relationship('Venue', viewonly=True)
 
+    # past/upcoming lookups per venue or artist, and the listing order
+    __table_args__ = (
+        db.Index('ix_shows_venue_id_start_time', venue_id, start_time),
+        db.Index('ix_shows_artist_id_start_time', artist_id, start_time),
+        db.Index('ix_shows_start_time_id', start_time, id),
+    )
+
+    @classmethod
+    def get_artist_ids_by_venue(cls, venue_id):
+        return [row.artist_id for row in cls.query.with_entities(cls.artist_id).filter_by(venue_id=venue_id).distinct()]
+
+    @classmethod
+    def get_venue_ids_by_artist(cls, artist_id):
+        return [row.venue_id for row in cls.query.with_entities(cls.venue_id).filter_by(artist_id=artist_id).distinct()]
+
+    @classmethod
+    def details_query(cls):
+        # imported here, artist and venue modules import Show
+        from models.artist import Artist
+        from models.venue import Venue
+
+        # plain columns of shows joined to artists and venues, no ORM objects
+        return db.session.query(
+            cls.id,
+            cls.venue_id,
+            Venue.name.label('venue_name'),
+            Venue.image_link.label('venue_image_link'),
+            cls.artist_id,
+            Artist.name.label('artist_name'),
+            Artist.image_link.label('artist_image_link'),
+            cls.start_time
+        ).join(Artist, Artist.id == cls.artist_id).join(Venue, Venue.id == cls.venue_id)
+
     @classmethod
-    def count_upcoming_by_venue_id(cls, venue_id):
-        return cls.query.filter_by(venue_id=venue_id).filter(cls.start_time > datetime.datetime.now()).count()
+    def get_changes(cls, owner, owner_column, related, related_column, owner_id):
+        # what a detail page depends on in one row: the owner's timestamp, the
+        # newest show and related entity, and counts that change on inserts or
+        # when a show starts, None when the owner does not exist
+        now = datetime.datetime.now()
+        return db.session.query(
+            owner.updated_at,
+            db.func.max(cls.updated_at),
+            db.func.max(related.updated_at),
+            db.func.count(cls.id),
+            db.func.sum(db.case([(cls.start_time > now, 1)], else_=0))
+        ).select_from(owner).outerjoin(cls, owner_column == owner.id).outerjoin(
+            related, related.id == related_column
+        ).filter(owner.id == owner_id).group_by(owner.id, owner.updated_at).first()
 
     @classmethod
-    def count_past_by_venue_id(cls, venue_id):
-        return cls.query.filter_by(venue_id=venue_id).filter(cls.start_time < datetime.datetime.now()).count()
+    def get_venue_changes(cls, venue_id):
+        from models.artist import Artist
+        from models.venue import Venue
+        return cls.get_changes(Venue, cls.venue_id, Artist, cls.artist_id, venue_id)
 
     @classmethod
-    def get_past_by_venue(cls, venue_id):
-        shows = cls.query.filter_by(venue_id=venue_id).filter(cls.start_time < datetime.datetime.now()).all()
-        return [show.show_details for show in shows]
+    def get_artist_changes(cls, artist_id):
+        from models.artist import Artist
+        from models.venue import Venue
+        return cls.get_changes(Artist, cls.artist_id, Venue, cls.venue_id, artist_id)
 
     @classmethod
-    def get_past_by_artist(cls, artist_id):
-        shows = cls.query.filter_by(artist_id=artist_id).filter(cls.start_time < datetime.datetime.now()).all()
-        return [show.show_details for show in shows]
+    def get_split_by(cls, column, id):
+        # every show of a venue or artist in one query, split against one now
+        now = datetime.datetime.now()
+        past, upcoming = [], []
+        for show in cls.details_query().filter(column == id).order_by(cls.start_time, cls.id):
+            if show.start_time < now:
+                past.append(cls.row_details(show))
+            elif show.start_time > now:
+                upcoming.append(cls.row_details(show))
+        return past, upcoming
 
     @classmethod
-    def get_upcoming_by_venue(cls, venue_id):
-        shows = cls.query.filter_by(venue_id=venue_id).filter(Show.start_time > datetime.datetime.now()).all()
-        return [show.show_details for show in shows]
+    def get_split_by_venue(cls, venue_id):
+        return cls.get_split_by(cls.venue_id, venue_id)
 
     @classmethod
-    def get_upcoming_by_artist(cls, artist_id):
-        shows = cls.query.filter_by(artist_id=artist_id).filter(Show.start_time > datetime.datetime.now()).all()
-        return [show.show_details for show in shows]
+    def get_split_by_artist(cls, artist_id):
+        return cls.get_split_by(cls.artist_id, artist_id)
 
     @classmethod
-    def get_all(cls):
-        return [show.show_details for show in cls.query.order_by(cls.venue_id.desc()).all()]
+    def get_all(cls, after=None, before=None, limit=None):
+        page = paginate(cls.details_query(), [cls.start_time, cls.id], after=after, before=before, limit=limit)
+        return page._replace(items=[cls.row_details(show) for show in page.items])
 
-    @property
-    def show_details(self):
+    @staticmethod
+    def row_details(row):
         return {
-            'id': self.id,
-            'venue_id': self.venue_id,
-            'venue_name': self.venue.name,
-            "artist_id": self.artist_id,
-            "artist_name": self.artist.name,
-            "artist_image_link": self.artist.image_link,
-            'start_time': self.start_time.strftime("%m/%d/%Y, %H:%M")
+            'id': row.id,
+            'venue_id': row.venue_id,
+            'venue_name': row.venue_name,
+            'venue_image_link': row.venue_image_link,
+            'artist_id': row.artist_id,
+            'artist_name': row.artist_name,
+            'artist_image_link': row.artist_image_link,
+            'start_time': row.start_time
         }
 
     def __repr__(self):
@@ -1,5 +1,14 @@
+import datetime
+from collections import OrderedDict
+
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import validates
+
 from models import db
-from models.genre import VenueGenre
+from models.directory import VenueDirectory
+from models.genre import VenueGenre, genre_registry
+from models.pagination import paginate
+from models.search import fold_name, prefix_search, search
 from models.show import Show
 
 
@@ -8,6 +17,9 @@ class Venue(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String, unique=True)
+    # fold_name(name), kept by _fold_name and set by the bulk loaders, compared
+    # in byte order by autocomplete
+    name_key = db.Column(db.String().with_variant(postgresql.VARCHAR(collation='C'), 'postgresql'), index=True)
     city = db.Column(db.String(120))
     state = db.Column(db.String(120))
     address = db.Column(db.String(120))
@@ -18,35 +30,41 @@ class Venue(db.Model):
     seeking_description = db.Column(db.Text, nullable=True)
     website = db.Column(db.String())
     deleted = db.Column(db.Boolean, default=False)
+    # kept by models.counters.ShowRollover, listings read these instead of counting shows
+    upcoming_show_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    past_show_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    # set on every ORM or core insert and update, drives Last-Modified
+    updated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow, index=True)
 
     shows = db.relationship('Show', backref='venues', lazy=True)
     genres = db.relationship('Genre', secondary='venue_genre', viewonly=True)
 
-    def add_genres(self, items):
-        return [
-            VenueGenre(venue_id=self.id, genre_id=genre)
-            for genre in items
-        ]
+    # backs the case-insensitive name check in exists
+    __table_args__ = (
+        db.Index('ix_venues_lower_name', db.func.lower(name)),
+    )
+
+    @validates('name')
+    def _fold_name(self, key, name):
+        self.name_key = fold_name(name)
+        return name
 
     def get_genres(self):
-        return [genre.name for genre in self.genres]
+        # names come from the registry, only the venue_genre rows are loaded
+        return [genre_registry.name(link.genre_id) for link in self.venue_genre]
 
-    def update_genres(self, genres):
-        #  genres in db
-        venue_genres_in_db = VenueGenre.get_genres_ids(venue_id=self.id)
+    def get_genre_ids(self):
+        # form values, from the same links as get_genres
+        return [str(link.genre_id) for link in self.venue_genre]
 
-        # generate a list of new genres not in db
-        genres_to_insert = list(set(genres) - set(venue_genres_in_db))
-        if genres_to_insert:
-            genres_objs = self.add_genres(genres_to_insert)
-            db.session.add_all(genres_objs)
+    def sync_genres(self, genre_ids, current=None):
+        # genre links live in another table, the venue row is touched for them
+        if VenueGenre.sync(self.id, genre_ids, current):
+            self.updated_at = datetime.datetime.utcnow()
 
     @classmethod
-    def get_enum(cls):
-        return [
-            (venue.id, venue.name)
-            for venue in cls.query.with_entities(cls.id, cls.name).all()
-        ]
+    def autocomplete(cls, prefix, limit=None):
+        return [{'id': venue.id, 'name': venue.name} for venue in prefix_search(cls, prefix, limit=limit)]
 
     @classmethod
     def get_by_id(cls, id):
@@ -54,11 +72,12 @@ class Venue(db.Model):
 
     @classmethod
     def get_by_id_full(cls, id):
+        # two queries however many shows: the venue with its genre links,
+        # then its shows joined to artist names
         details = {}
-        venue = cls.get_by_id(id)
-        past_shows = Show.get_past_by_venue(id)
-        upcoming_shows = Show.get_upcoming_by_venue(id)
-        details.update(venue)
+        venue = cls.query.options(db.joinedload(cls.venue_genre)).filter_by(id=id).first_or_404()
+        past_shows, upcoming_shows = Show.get_split_by_venue(id)
+        details.update(venue.serialize)
         details.update({'upcoming_shows': upcoming_shows})
         details.update({'upcoming_shows_count': len(upcoming_shows)})
         details.update({'past_shows': past_shows})
@@ -67,15 +86,14 @@ class Venue(db.Model):
         return details
 
     @classmethod
-    def search_by_name(cls, venue_name):
-        venues = cls.query.filter(
-            cls.name.ilike(f'%{venue_name}%')
-        ).all()
+    def search_by_name(cls, venue_name, limit=None):
+        # ranked match on name, city or genre
+        venues = search(cls, VenueGenre, VenueGenre.venue_id, venue_name, limit=limit)
         return [
             {
                 "id": venue.id,
                 "name": venue.name,
-                "num_upcoming_shows": Show.count_upcoming_by_venue_id(venue.id)
+                "num_upcoming_shows": venue.upcoming_show_count
             }
             for venue in venues
         ]
@@ -89,32 +107,31 @@ class Venue(db.Model):
         return cls.query.get_or_404(id).serialize
 
     @classmethod
-    def get_by_city_state(cls, state, city):
-        state_venues = cls.query.filter_by(city=city, state=state).all()
-
-        venues = [
-            {
-                "id": venue.id,
-                "name": venue.name,
-                "num_upcoming_shows": Show.count_upcoming_by_venue_id(venue.id)
-            }
-            for venue in state_venues
-        ]
-        return venues
-
-    @classmethod
-    def get_all(cls):
-        venues = cls.query.with_entities(cls.city, cls.state).group_by(cls.state, cls.city).all()
-        results = [
-            {
-                'city': venue.city,
-                'state': venue.state,
-                'venues': cls.get_by_city_state(state=venue.state, city=venue.city)
-            }
-            for venue in venues
-        ]
-
-        return results
+    def get_all(cls, after=None, before=None, limit=None):
+        # read from the venue directory, a write shows up after the next
+        # refresh_venue_directory, roll_shows or bulk load, or right away
+        # with VENUE_DIRECTORY_REFRESH_ON_WRITE
+        directory = VenueDirectory
+        query = db.session.query(directory.id, directory.name, directory.city, directory.state,
+                                 directory.upcoming_show_count)
+        page = paginate(query, [directory.state, directory.city, directory.id],
+                        after=after, before=before, limit=limit)
+
+        # group venues by (city, state) keeping the page order
+        areas = OrderedDict()
+        for row in page.items:
+            area = areas.setdefault((row.city, row.state), {
+                'city': row.city,
+                'state': row.state,
+                'venues': []
+            })
+            area['venues'].append({
+                'id': row.id,
+                'name': row.name,
+                'num_upcoming_shows': row.upcoming_show_count
+            })
+
+        return page._replace(items=list(areas.values()))
 
     @property
     def serialize(self):
@@ -0,0 +1,36 @@
+import datetime
+
+from models import db
+
+
+class Version(db.Model):
+    # change counters, bumped in the same transaction as the write they track
+    __tablename__ = 'versions'
+
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+    # when the tracked rows last changed in a way their updated_at does not
+    # show, a delete or a venue directory refresh
+    updated_at = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+
+    @classmethod
+    def get_many(cls, *names):
+        versions = dict.fromkeys(names, 0)
+        versions.update(
+            (version.name, version.value)
+            for version in cls.query.with_entities(cls.name, cls.value).filter(cls.name.in_(names))
+        )
+        return versions
+
+    @classmethod
+    def bump(cls, *names):
+        for name in names:
+            updated = cls.query.filter_by(name=name).update(
+                {cls.value: cls.value + 1, cls.updated_at: datetime.datetime.utcnow()},
+                synchronize_session=False
+            )
+            if not updated:
+                db.session.add(cls(name=name, value=1))
+
+    def __repr__(self):
+        return f'<Version name: {self.name} value: {self.value}>'
@@ -0,0 +1,42 @@
+// typeahead for the id fields of the show form, an input with
+// data-autocomplete="<url>" fills the hidden field named in data-target
+(function () {
+  function attach(input) {
+    var target = document.getElementById(input.getAttribute('data-target'));
+    var list = document.getElementById(input.getAttribute('list'));
+    var ids = {};
+    var timer = null;
+
+    function lookup() {
+      var term = input.value.trim();
+      if (!term) {
+        return;
+      }
+      fetch(input.getAttribute('data-autocomplete') + '?q=' + encodeURIComponent(term))
+        .then(function (response) { return response.json(); })
+        .then(function (body) {
+          list.innerHTML = '';
+          ids = {};
+          body.data.forEach(function (item) {
+            var option = document.createElement('option');
+            option.value = item.name;
+            list.appendChild(option);
+            ids[item.name] = item.id;
+          });
+          select();
+        });
+    }
+
+    function select() {
+      target.value = ids.hasOwnProperty(input.value) ? ids[input.value] : '';
+    }
+
+    input.addEventListener('input', function () {
+      select();
+      clearTimeout(timer);
+      timer = setTimeout(lookup, 150);
+    });
+  }
+
+  document.querySelectorAll('[data-autocomplete]').forEach(attach);
+})();
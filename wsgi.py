@@ -0,0 +1,6 @@
+# production entry point, gunicorn -c gunicorn.conf.py wsgi:app
+import os
+
+os.environ.setdefault('FYYUR_ENV', 'production')
+
+from app import app  # noqa: E402